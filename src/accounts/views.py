@@ -3,7 +3,8 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
-from store.models import Order, Cart, Favorite
+from store.guestcart import merge_guest_cart
+from store.models import Order, Favorite
 
 
 def register_view(request):
@@ -15,6 +16,7 @@ def register_view(request):
             username = form.cleaned_data.get('username')
             messages.success(request, f'Акаунт створено для {username}!')
             login(request, user)
+            merge_guest_cart(request, user)
             return redirect('index')
     else:
         form = CustomUserCreationForm()
@@ -31,6 +33,7 @@ def login_view(request):
             user = authenticate(username=username, password=password)
             if user is not None:
                 login(request, user)
+                merge_guest_cart(request, user)
                 messages.info(request, f'Ви увійшли як {username}.')
                 # Перенаправляем на страницу, с которой пришел пользователь
                 next_url = request.GET.get('next', 'index')
@@ -65,11 +68,7 @@ def profile_view(request):
         return redirect('profile')
     
     # Получаем заказы пользователя
-    orders = Order.objects.filter(user=request.user).prefetch_related('items__product')[:5]
-    
-    # Получаем количество товаров в корзине
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items_count = cart.get_total_items()
+    orders = Order.objects.filter(user=request.user).prefetch_related('items')[:5]
 
     # Избранные товары
     favorite_products = [f.product for f in Favorite.objects.filter(user=request.user).select_related("product", "product__category")]
@@ -77,7 +76,6 @@ def profile_view(request):
     context = {
         'user': request.user,
         'orders': orders,
-        'cart_items_count': cart_items_count,
         'favorite_products': favorite_products,
     }
     return render(request, 'accounts/profile.html', context)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 import dj_database_url
 
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "store.querybudget.QueryBudgetMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -65,6 +67,7 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "store.context_processors.categories_processor",
                 "store.context_processors.footer_processor",
+                "store.context_processors.cart_processor",
             ],
         },
     },
@@ -129,6 +132,94 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# ===================== КЭШ =====================
+
+# Кэш общий для всех процессов: версии навигации, карточек, подсказок и
+# поколения страниц сбрасываются в одном процессе (админка, compact_stock,
+# recompute_popularity по cron, другой воркер gunicorn), а читаются в других.
+# Локальный LocMemCache для этого не годится: в каждом процессе он свой.
+# REDIS_URL – Redis (обязателен, если приложение работает на нескольких
+# серверах); без него – файлы в CACHE_DIR, общие для процессов одного сервера.
+# Дерево навигации к тому же запоминается в памяти процесса (store.navigation).
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CACHE_DIR", os.path.join(tempfile.gettempdir(), "shop-cache")),
+            "OPTIONS": {"MAX_ENTRIES": 50000},
+        }
+    }
+
+# ===================== КЭШ СТРАНИЦ =====================
+
+# Сколько секунд хранить HTML каталога для анонимных посетителей
+# (см. store.pagecache); изменения товаров сбрасывают его раньше
+PAGE_CACHE_TIMEOUT = 300
+
+# ===================== РЕЗЕРВЫ ТОВАРА =====================
+
+# На сколько секунд добавление в корзину резервирует товар
+# (см. store.reservations); просроченные удаляет sweep_reservations
+STOCK_RESERVATION_TTL = 15 * 60
+
+# ===================== БЮДЖЕТ SQL-ЗАПРОСОВ =====================
+
+# Сколько SQL-запросов может сделать view (см. store.querybudget).
+# В продакшене превышения и N+1 пишутся в лог, в тестах – исключение.
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGETS = {
+    "index": 15,
+    "product_list": 15,
+    "product_detail": 12,
+    "products_api": 5,
+    "search_suggestions": 2,
+    # Перенос гостевой корзины и её резервов – фиксированный набор запросов
+    "login": 25,
+    "register": 25,
+}
+QUERY_BUDGET_NPLUSONE_THRESHOLD = 5
+QUERY_BUDGET_RAISE = bool(int(os.environ.get("QUERY_BUDGET_RAISE", "0")))
+
+# ===================== ФОНОВЫЕ ЗАДАЧИ =====================
+
+# Очередь в БД (см. store.tasks), выполняет manage.py run_worker.
+# Повтор упавшей задачи через TASK_RETRY_DELAY * 2 ** (попытка - 1) секунд
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 30
+TASK_RETRY_MAX_DELAY = 60 * 60
+# Через сколько секунд задача «running» считается брошенной упавшим воркером
+TASK_LOCK_TIMEOUT = 10 * 60
+
+# ===================== АНАЛИТИКА =====================
+
+# События копятся в памяти воркера (см. store.analytics) и пишутся пачкой,
+# когда их набралось ANALYTICS_BUFFER_SIZE или прошло ANALYTICS_FLUSH_INTERVAL секунд
+ANALYTICS_BUFFER_SIZE = 200
+ANALYTICS_FLUSH_INTERVAL = 30
+
+# ===================== ПОЧТА =====================
+
+# В разработке письма печатаются в консоль воркера
+EMAIL_BACKEND = os.environ.get(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend" if DEBUG
+    else "django.core.mail.backends.smtp.EmailBackend",
+)
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = bool(int(os.environ.get("EMAIL_USE_TLS", "0")))
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "webmaster@localhost")
+
 # ===================== АВТОРИЗАЦИЯ =====================
 
 LOGIN_REDIRECT_URL = "/"
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Индекс подсказок поиска строится при старте воркера, а не на первом запросе
+from store.suggestions import warm_up  # noqa: E402
+
+warm_up()
@@ -1,5 +1,11 @@
+from django import forms
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Order, OrderItem, Favorite, Page, FooterSection, FooterLink, ProductImage
+from django.utils import timezone
+from .models import Category, Product, Cart, CartItem, Order, OrderItem, Favorite, Page, FooterSection, FooterLink, ProductImage, StockMovement, StockReservation, Task
+from .inventory import pending_delta, with_current_stock
+from .notifications import send_order_status_email
+from .pricing import price_items, with_totals
+from .tasks import enqueue
 
 
 class SubCategoryInline(admin.TabularInline):
@@ -13,6 +19,7 @@ class SubCategoryInline(admin.TabularInline):
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ["name", "slug", "parent"]
+    list_select_related = ["parent__parent"]
     list_filter = ["parent"]
     search_fields = ["name", "slug"]
     prepopulated_fields = {"slug": ("name",)}
@@ -22,14 +29,43 @@ class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
 
+class ProductAdminForm(forms.ModelForm):
+    class Meta:
+        model = Product
+        fields = "__all__"
+
+    def clean_stock(self):
+        """Несвёрнутые заказы уже вычтены из остатка – снимок не может быть меньше проданного."""
+        stock = self.cleaned_data["stock"]
+        if self.instance.pk is not None:
+            sold = -pending_delta(self.instance.pk)
+            if sold > 0 and stock < sold:
+                raise forms.ValidationError(
+                    f"По заказам уже продано {sold} шт., ещё не списанных со склада: "
+                    f"остаток не может быть меньше {sold}"
+                )
+        return stock
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ["name", "category", "price", "stock", "image_preview", "created_at"]
+    form = ProductAdminForm
+    list_display = ["name", "category", "price", "stock", "current_stock", "views", "image_preview", "created_at"]
+    list_select_related = ["category__parent"]
     list_filter = ["category", "created_at"]
     search_fields = ["name", "description"]
-    readonly_fields = ["image_preview"]
+    readonly_fields = ["image_preview", "current_stock"]
     inlines = [ProductImageInline]
 
+    def get_queryset(self, request):
+        # stock – снимок; заказы после последней свёртки журнала видны в current_stock
+        return with_current_stock(super().get_queryset(request))
+
+    def current_stock(self, obj):
+        return getattr(obj, "current_stock", obj.stock)
+    current_stock.short_description = "С учётом заказов"
+    current_stock.admin_order_field = "current_stock"
+
     def image_preview(self, obj):
         if obj.image:
             return f'<img src="{obj.image.url}" style="max-height: 100px; max-width: 100px;" />'
@@ -42,25 +78,59 @@ class ProductAdmin(admin.ModelAdmin):
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
-    readonly_fields = ['added_at']
+    readonly_fields = ['added_at', 'item_unit_price', 'item_line_total']
+
+    def get_queryset(self, request):
+        # Цены строк считает store.pricing – так же, как корзина и оформление
+        return price_items(super().get_queryset(request).select_related('product'))
+
+    def item_unit_price(self, obj):
+        return getattr(obj, 'unit_price', None)
+    item_unit_price.short_description = "Цена"
+
+    def item_line_total(self, obj):
+        return getattr(obj, 'line_total', None)
+    item_line_total.short_description = "Сумма"
 
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['user', 'get_total_items', 'get_total_price', 'updated_at']
+    list_display = ['user', 'cart_items_count', 'cart_discount', 'cart_total', 'updated_at']
+    list_select_related = ['user']
     inlines = [CartItemInline]
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        # Итоги всех корзин страницы – одним агрегатом, без запросов на строку
+        return with_totals(super().get_queryset(request))
+
+    def cart_items_count(self, obj):
+        return obj.items_count
+    cart_items_count.short_description = "Товаров"
+    cart_items_count.admin_order_field = "items_count"
+
+    def cart_discount(self, obj):
+        return obj.discount
+    cart_discount.short_description = "Скидка"
+    cart_discount.admin_order_field = "discount"
+
+    def cart_total(self, obj):
+        return obj.total
+    cart_total.short_description = "Сумма"
+    cart_total.admin_order_field = "total"
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ['product', 'quantity', 'price', 'get_total_price']
+    fields = ['product', 'sku', 'product_name', 'category_name', 'quantity', 'price', 'get_total_price']
+    readonly_fields = fields
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'status', 'total_price', 'created_at']
+    list_select_related = ['user']
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'user__email']
     inlines = [OrderItemInline]
@@ -68,19 +138,59 @@ class OrderAdmin(admin.ModelAdmin):
     
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        # Если статус изменился на "В обработке", можно отправить уведомление
+        # Письмо о смене статуса уходит из воркера (run_worker), не из запроса
         if change and 'status' in form.changed_data:
-            # Здесь можно добавить логику отправки email
-            pass
+            enqueue(send_order_status_email, order_id=obj.pk, status=obj.status)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "name"]
+    search_fields = ["name"]
+    readonly_fields = ["locked_at", "locked_by", "last_error", "created_at", "finished_at"]
+    actions = ["requeue"]
+
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status="running").update(
+            status="queued", attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f"Возвращено в очередь: {updated}")
+    requeue.short_description = "Запустить повторно"
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ["user", "product", "created_at"]
+    list_select_related = ["user", "product"]
     list_filter = ["created_at"]
     search_fields = ["user__username", "user__email", "product__name"]
 
 
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ["product", "delta", "reason", "order", "applied", "created_at"]
+    list_select_related = ["product"]
+    list_filter = ["reason", "applied", "created_at"]
+    search_fields = ["product__name"]
+    readonly_fields = ["product", "delta", "reason", "order", "applied", "created_at"]
+
+    # Журнал только пополняется – правится через остаток товара
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ["product", "holder", "quantity", "expires_at"]
+    list_select_related = ["product"]
+    list_filter = ["expires_at"]
+    search_fields = ["holder", "product__name"]
+
+
 @admin.register(Page)
 class PageAdmin(admin.ModelAdmin):
     list_display = ["title", "slug", "updated_at"]
@@ -0,0 +1,229 @@
+"""
+Аналитика поиска и просмотров товаров без записи в БД на каждый запрос.
+
+События копятся в буфере памяти воркера и пишутся пачкой, когда набралось
+ANALYTICS_BUFFER_SIZE событий (для счётчиков – разных ключей) или с прошлой
+записи прошло ANALYTICS_FLUSH_INTERVAL секунд (проверяется при следующем
+событии), а также при остановке процесса (atexit). Если запись не удалась,
+пачка теряется с записью в лог – страницы из-за аналитики не падают.
+
+Поиск отмечается декоратором track_search(source): view сообщает число
+найденных товаров заголовком X-Search-Results, который сохраняется и в
+кэше страниц (store.pagecache), поэтому учитываются и ответы из кэша.
+Сводку строит команда rollup_search_events (по умолчанию без автодополнения).
+
+Просмотры товара считает декоратор count_product_view: в памяти
+складываются счётчики (товар, час), запись – один UPDATE Product.views
+и два запроса к почасовой таблице ProductViewHour, сколько бы раз ни
+открывали горячий товар. Тренды читают готовые часы (trending_products).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, models, transaction
+from django.utils import timezone
+
+from .models import Product, ProductViewHour, SearchEvent
+
+
+logger = logging.getLogger(__name__)
+
+RESULTS_HEADER = "X-Search-Results"
+QUERY_LENGTH = SearchEvent._meta.get_field("query").max_length
+PERCENTILES = (50, 90, 95, 99)
+
+
+class EventBuffer:
+    """Буфер событий процесса; flush(events) записывает пачку."""
+
+    def __init__(self, flush):
+        self._flush = flush
+        self._events = self._empty()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _empty(self):
+        return []
+
+    def _put(self, event):
+        self._events.append(event)
+
+    def add(self, event):
+        with self._lock:
+            self._put(event)
+            due = (
+                len(self._events) >= getattr(settings, "ANALYTICS_BUFFER_SIZE", 200)
+                or time.monotonic() - self._flushed_at >= getattr(settings, "ANALYTICS_FLUSH_INTERVAL", 30)
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленное. Возвращает число событий в пачке."""
+        with self._lock:
+            events, self._events = self._events, self._empty()
+            self._flushed_at = time.monotonic()
+        if not events:
+            return 0
+        try:
+            self._flush(events)
+        except DatabaseError:
+            logger.exception("Dropped %s buffered analytics events", len(events))
+        return len(events)
+
+
+class CounterBuffer(EventBuffer):
+    """Буфер счётчиков: одинаковые ключи складываются в памяти."""
+
+    def _empty(self):
+        return Counter()
+
+    def _put(self, key):
+        self._events[key] += 1
+
+
+def _write_search_events(events):
+    SearchEvent.objects.bulk_create(events, batch_size=500)
+
+
+search_events = EventBuffer(_write_search_events)
+atexit.register(search_events.flush)
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())[:QUERY_LENGTH]
+
+
+def record_search(query, source, results, duration_ms):
+    query = normalize_query(query)
+    if query:
+        search_events.add(SearchEvent(
+            query=query,
+            source=source,
+            results=results,
+            duration_ms=duration_ms,
+            created_at=timezone.now(),
+        ))
+
+
+def track_search(source):
+    """
+    Декоратор view поиска: записывает запрос ?q=, время ответа и число
+    найденного (заголовок X-Search-Results). Листание страниц (?cursor=)
+    новым поиском не считается.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            query = request.GET.get("q", "")
+            if not query.strip() or request.GET.get("cursor"):
+                return view(request, *args, **kwargs)
+            started = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            results = response.get(RESULTS_HEADER)
+            if results is not None:
+                record_search(query, source, int(results), (time.perf_counter() - started) * 1000)
+            return response
+        return wrapped
+    return decorator
+
+
+def search_rollup(since, limit=20, source="catalog"):
+    """
+    Сводка поиска с момента since: популярные запросы, запросы без
+    результатов и перцентили времени ответа (мс) методом ближайшего ранга.
+
+    По умолчанию – только поиск по каталогу: автодополнение пишет событие на
+    каждое нажатие клавиши («с», «са», «сам»...), и эти префиксы вытеснили
+    бы настоящие запросы из топа. source=None – все источники.
+    """
+    events = SearchEvent.objects.filter(created_at__gte=since)
+    if source:
+        events = events.filter(source=source)
+    by_query = events.values("query").annotate(
+        searches=models.Count("id"),
+        zero=models.Count("id", filter=models.Q(results=0)),
+    )
+    total = events.count()
+    durations = events.order_by("duration_ms").values_list("duration_ms", flat=True)
+    return {
+        "total": total,
+        "zero": events.filter(results=0).count(),
+        "top": list(by_query.order_by("-searches", "query")[:limit]),
+        "zero_results": list(by_query.filter(zero__gt=0).order_by("-zero", "query")[:limit]),
+        # Одно значение на перцентиль: ORDER BY ... OFFSET, без выгрузки всех строк
+        "latency": {
+            p: durations[max((total * p + 99) // 100 - 1, 0)] if total else None
+            for p in PERCENTILES
+        },
+    }
+
+
+def _write_product_views(counts):
+    """counts – Counter {(product_id, час): просмотров}."""
+    totals = Counter()
+    for (product_id, _), views in counts.items():
+        totals[product_id] += views
+    with transaction.atomic():
+        Product.objects.filter(pk__in=totals).update(
+            views=models.F("views")
+            + models.Case(
+                *(models.When(pk=pk, then=models.Value(views)) for pk, views in totals.items()),
+                output_field=models.PositiveBigIntegerField(),
+            )
+        )
+        # Строки часов создаются пустыми (параллельный воркер мог создать их раньше),
+        # затем один UPDATE прибавляет просмотры – без потерянных инкрементов
+        existing = set(Product.objects.filter(pk__in=totals).values_list("pk", flat=True))
+        keys = [(product_id, hour) for product_id, hour in counts if product_id in existing]
+        ProductViewHour.objects.bulk_create(
+            (ProductViewHour(product_id=product_id, hour=hour) for product_id, hour in keys),
+            ignore_conflicts=True,
+        )
+        for hour in {hour for _, hour in keys}:
+            in_hour = {pk: counts[pk, hour] for pk, h in keys if h == hour}
+            ProductViewHour.objects.filter(hour=hour, product_id__in=in_hour).update(
+                views=models.F("views")
+                + models.Case(
+                    *(models.When(product_id=pk, then=models.Value(views)) for pk, views in in_hour.items()),
+                    output_field=models.PositiveIntegerField(),
+                )
+            )
+
+
+product_views = CounterBuffer(_write_product_views)
+atexit.register(product_views.flush)
+
+
+def record_product_view(product_id):
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    product_views.add((product_id, hour))
+
+
+def count_product_view(view):
+    """Декоратор страницы товара: считает успешные ответы, в т.ч. из кэша страниц."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method == "GET" and response.status_code == 200:
+            record_product_view(kwargs["product_id"])
+        return response
+    return wrapped
+
+
+def trending_products(hours=24, limit=10):
+    """[(product_id, просмотров)] за последние hours часов – по почасовой таблице."""
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    return list(
+        ProductViewHour.objects.filter(hour__gte=since)
+        .values("product")
+        .annotate(total=models.Sum("views"))
+        .order_by("-total", "product")
+        .values_list("product", "total")[:limit]
+    )
@@ -0,0 +1,43 @@
+"""
+Версии кэшированных карточек товаров.
+
+Карточка в списках кэшируется тегом {% cache %} с ключом (id, card_version).
+Версия товара хранится в кэше и заменяется при сохранении/удалении Product,
+ProductImage или переименовании категории (см. store.signals), поэтому
+старые фрагменты просто перестают читаться и вытесняются по таймауту.
+
+Версии всех карточек страницы читаются одним get_many в attach_card_versions().
+Состояние пользователя (избранное, csrf) рендерится вне кэшированного блока.
+"""
+import time
+
+from django.core.cache import cache
+
+
+VERSION_KEY = "product-card-version:{}"
+
+
+def _new_version():
+    # Не счётчик с 1: если ключ версии вытеснен, новая версия не совпадёт
+    # со старыми фрагментами, которые ещё лежат в кэше
+    return time.time_ns()
+
+
+def attach_card_versions(products):
+    """Проставляет product.card_version каждому товару списка. Возвращает список."""
+    products = list(products)
+    keys = {VERSION_KEY.format(product.pk): product for product in products}
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    for key, product in keys.items():
+        product.card_version = versions[key]
+    return products
+
+
+def bump_card_versions(product_ids):
+    """Инвалидирует кэшированные карточки указанных товаров."""
+    version = _new_version()
+    cache.set_many({VERSION_KEY.format(pk): version for pk in product_ids}, timeout=None)
@@ -0,0 +1,40 @@
+"""
+Сводка корзины для бейджа в шапке (количество товаров и сумма).
+
+Источник правды – денормализованные Cart.total_items/total_price, которые
+пересчитываются при каждом изменении CartItem. Для чтения сводка кэшируется
+по id пользователя, поэтому страницы, где нужен только бейдж, не делают
+запросов к корзине; кэш сбрасывается после фиксации изменения.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Cart
+
+
+SUMMARY_KEY = "cart-summary:{}"
+SUMMARY_TIMEOUT = 60 * 5
+
+EMPTY_SUMMARY = (0, Decimal("0"))
+
+
+def get_cart_summary(user):
+    """(total_items, total_price) корзины пользователя; без корзины – нули."""
+    key = SUMMARY_KEY.format(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = (
+            Cart.objects.filter(user=user).values_list("total_items", "total_price").first()
+            or EMPTY_SUMMARY
+        )
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def forget_cart_summaries(user_ids):
+    """Сбрасывает закэшированные сводки после фиксации текущей транзакции."""
+    keys = [SUMMARY_KEY.format(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
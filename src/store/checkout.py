@@ -0,0 +1,104 @@
+"""
+Оформление заказа набором запросов, число которых не зависит от размера корзины.
+
+1. Строка корзины блокируется – повторный сабмит ждёт первый.
+2. Заказ и его позиции создаются одним INSERT и одним bulk_create.
+3. В конце строки товаров блокируются в порядке id (без взаимных блокировок
+   между параллельными заказами), но не переписываются; следующий запрос читает
+   точный остаток (снимок плюс журнал, см. store.inventory) за вычетом
+   активных резервов других покупателей (store.reservations), списание –
+   один INSERT в журнал остатков. Блокировка держится только до фиксации.
+   Если чего-то не хватает, транзакция откатывается и выбрасывается
+   OutOfStock с перечнем недостающих товаров.
+4. Корзина и резервы покупателя очищаются одним DELETE каждая.
+
+Product.stock, фасеты и кэши карточек обновит свёртка журнала (compact_stock).
+"""
+from django.db import connection, transaction
+
+from .cartsummary import forget_cart_summaries
+from .inventory import record_order
+from .models import Cart, CartItem, Order, OrderItem, Product
+from .popularity import record_sales_on_commit
+from .pricing import price_cart
+from .reservations import release, user_holder, with_available
+
+
+class EmptyCart(Exception):
+    """В корзине нет товаров."""
+
+
+class OutOfStock(Exception):
+    """Часть товаров закончилась. shortages – [(товар, запрошено, доступно)]."""
+
+    def __init__(self, shortages):
+        super().__init__(shortages)
+        self.shortages = shortages
+
+
+def _write_off_stock(order, items, holder):
+    """Списывает остатки записями журнала; если товара не хватает – OutOfStock."""
+    quantities = {item.product_id: item.quantity for item in items}
+    # Сначала блокировка отдельным запросом, в порядке id – одинаковом для всех
+    # заказов. Остаток читается следующим запросом: в Postgres (READ COMMITTED)
+    # подзапросы по журналу и резервам в том же SELECT ... FOR UPDATE видели бы
+    # снимок до ожидания блокировки, без записей заказа, который её держал
+    list(
+        Product.objects.select_for_update()
+        .filter(pk__in=quantities)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    products = Product.objects.filter(pk__in=quantities)
+    available = dict(with_available(products, holder).values_list("pk", "available"))
+    shortages = [
+        (item.product, item.quantity, max(available.get(item.product_id, 0), 0))
+        for item in items
+        if item.quantity > available.get(item.product_id, 0)
+    ]
+    if shortages:
+        raise OutOfStock(shortages)
+    record_order(order, quantities)
+
+
+def place_order(user):
+    """
+    Оформляет заказ из корзины пользователя.
+    Бросает EmptyCart или OutOfStock; в обоих случаях ничего не меняется.
+    """
+    holder = user_holder(user)
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(user=user).first()
+        pricing = price_cart(cart) if cart is not None else None
+        if not pricing:
+            raise EmptyCart()
+        items = pricing.items
+
+        order = Order.objects.create(user=user, total_price=pricing.total)
+        OrderItem.objects.bulk_create(
+            OrderItem.for_product(
+                item.product,
+                order=order,
+                quantity=item.quantity,
+                price=item.unit_price,
+            )
+            for item in items
+        )
+
+        # Последним шагом – чтобы строки товаров были заблокированы как можно меньше
+        _write_off_stock(order, items, holder)
+
+        # Один DELETE без выборки строк и поштучных сигналов CartItem:
+        # сводка корзины обнуляется ниже, резервы снимает release()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(CartItem._meta.db_table)} WHERE cart_id = %s",
+                [cart.pk],
+            )
+        Cart.objects.filter(pk=cart.pk).update(total_items=0, total_price=0)
+        forget_cart_summaries([user.pk])
+        release(holder)
+
+        # Рейтинг популярности обновляется только после фиксации заказа
+        record_sales_on_commit((item.product_id, item.quantity) for item in items)
+    return order
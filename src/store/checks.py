@@ -0,0 +1,27 @@
+"""
+Проверки конфигурации магазина (manage.py check, запуск сервера и команд).
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+# Бэкенды, у которых кэш свой в каждом процессе
+PROCESS_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Версии карточек, подсказок и поколения страниц сбрасываются командами
+    по cron (compact_stock, recompute_popularity, reconcile_stock --fix)
+    и воркером задач, а читаются воркерами gunicorn. С кэшем в памяти
+    процесса сброс до них не доходит, и страницы остаются устаревшими.
+    """
+    backend = getattr(settings, "CACHES", {}).get("default", {}).get("BACKEND", "")
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    message = "The default cache is process-local: invalidation from cron commands and other workers is lost."
+    hint = "Set REDIS_URL or use a file-based cache (see CACHES in settings)."
+    if settings.DEBUG:
+        return [Warning(message, hint=hint, id="store.W001")]
+    return [Error(message, hint=hint, id="store.E001")]
@@ -1,16 +1,86 @@
+"""
+Context processors магазина.
+
+Значения отдаются ленивыми прокси: запрос к кэшу/БД выполняется только при
+первом обращении шаблона и не более одного раза за render(). Какой шаблон
+(и строка) вызвал вычисление, пишется в лог store.context_processors на
+уровне DEBUG и копится в processor_usage – так видно, каким страницам
+меню и футер действительно нужны.
+"""
+import logging
+from collections import Counter
+
+from django.utils.functional import SimpleLazyObject
+
+from store.querybudget import query_origin
+
+
+logger = logging.getLogger(__name__)
+
+# (processor, шаблон:строка) -> сколько раз значение вычислялось
+processor_usage = Counter()
+
+
+def _lazy(request, processor, factory):
+    def evaluate():
+        origin = query_origin()
+        processor_usage[processor, origin] += 1
+        used = getattr(request, "context_processors_used", None)
+        if used is not None:
+            used.append((processor, origin))
+        else:
+            request.context_processors_used = [(processor, origin)]
+        logger.debug("%s evaluated for %s (%s)", processor, origin, request.path)
+        return factory()
+    return SimpleLazyObject(evaluate)
+
+
 def categories_processor(request):
     """
     Context processor to make root categories and their subcategories available in all templates.
     Useful for the burger menu and navigation.
     """
-    from store.models import Category
-    root_categories = Category.objects.filter(parent=None).prefetch_related('subcategories')
-    return {'all_categories': root_categories}
+    from store.navigation import get_navigation
+    return {
+        'all_categories': _lazy(
+            request, "categories_processor", lambda: get_navigation(request).roots
+        )
+    }
 
 def footer_processor(request):
     """
     Context processor to make footer sections available in all templates.
     """
     from store.models import FooterSection
-    footer_sections = FooterSection.objects.prefetch_related('links').all()
-    return {'footer_sections': footer_sections}
+    return {
+        'footer_sections': _lazy(
+            request,
+            "footer_processor",
+            lambda: list(FooterSection.objects.prefetch_related('links').all()),
+        )
+    }
+
+
+def _cart_summary(request):
+    if not request.user.is_authenticated:
+        # Гостевая корзина – в сессии (см. store.guestcart)
+        from store import guestcart
+        return (
+            guestcart.total_items(request),
+            SimpleLazyObject(lambda: guestcart.load(request).total),
+        )
+    from store.cartsummary import get_cart_summary
+    return get_cart_summary(request.user)
+
+
+def cart_processor(request):
+    """
+    Сводка корзины для бейджа: cart_items_count и cart_total.
+    Читается из кэша (см. store.cartsummary) или из сессии гостя,
+    без запросов к корзине.
+    """
+    summary = _lazy(request, "cart_processor", lambda: _cart_summary(request))
+    return {
+        'cart_items_count': SimpleLazyObject(lambda: summary[0]),
+        'cart_total': SimpleLazyObject(lambda: summary[1]),
+    }
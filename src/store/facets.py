@@ -0,0 +1,295 @@
+"""
+Фасетные фильтры каталога с предрасчитанными счётчиками.
+
+Счётчики хранятся в FacetCount по корневой категории и обновляются
+инкрементально при сохранении/удалении Product (см. store.signals).
+Для выдачи без поиска, ценового диапазона и выбранных фасетов счётчики
+читаются одним запросом; иначе считаются агрегатом по выдаче.
+
+Фасеты дизъюнктивные: счётчики группы (цена, наличие, скидка, бренд)
+учитывают выбранные значения остальных групп, но не своей – видно,
+сколько товаров даст другое значение той же группы.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+
+from .models import CATEGORY_PATH_STEP, FacetCount, Product
+
+
+# (ключ, подпись, нижняя граница включительно, верхняя граница не включительно)
+PRICE_BUCKETS = [
+    ("0-1000", "до 1 000 ₴", 0, 1000),
+    ("1000-5000", "1 000 – 5 000 ₴", 1000, 5000),
+    ("5000-10000", "5 000 – 10 000 ₴", 5000, 10000),
+    ("10000-20000", "10 000 – 20 000 ₴", 10000, 20000),
+    ("20000-40000", "20 000 – 40 000 ₴", 20000, 40000),
+    ("40000+", "від 40 000 ₴", 40000, None),
+]
+
+ON_SALE_Q = models.Q(effective_price__lt=models.F("price"))
+
+
+def price_bucket(price):
+    for key, _, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return key
+    return PRICE_BUCKETS[0][0]
+
+
+def _bucket_q(low, high):
+    q = models.Q(effective_price__gte=low)
+    if high is not None:
+        q &= models.Q(effective_price__lt=high)
+    return q
+
+
+def _brand_id(category_path):
+    """Бренд – предок первого уровня под корнем (из материализованного пути)."""
+    segment = category_path[CATEGORY_PATH_STEP + 1:2 * CATEGORY_PATH_STEP + 1]
+    return int(segment) if segment else None
+
+
+def facet_values(category_path, price, sale_price, stock):
+    """Множество (фасет, значение), к которым относится товар."""
+    on_sale = sale_price is not None and sale_price < price and price > 0
+    values = {("price", price_bucket(sale_price if on_sale else price))}
+    brand_id = _brand_id(category_path)
+    if brand_id:
+        values.add(("brand", str(brand_id)))
+    if stock > 0:
+        values.add(("in_stock", "1"))
+    if on_sale:
+        values.add(("on_sale", "1"))
+    return values
+
+
+def product_facet_state(product):
+    """(id корня, значения фасетов) для сохранённого экземпляра Product."""
+    path = product.category.path
+    return product.root_category_id, facet_values(
+        path, product.price, product.sale_price, product.stock
+    )
+
+
+def stored_facet_state(product_id):
+    """То же самое, но по текущей строке в БД (до сохранения изменений)."""
+    row = (
+        Product.objects.filter(pk=product_id)
+        .values("root_category_id", "category__path", "price", "sale_price", "stock")
+        .first()
+    )
+    if row is None:
+        return None
+    return row["root_category_id"], facet_values(
+        row["category__path"], row["price"], row["sale_price"], row["stock"]
+    )
+
+
+def _apply_delta(root_id, values, delta):
+    for facet, value in values:
+        lookup = {"category_id": root_id, "facet": facet, "value": value}
+        updated = FacetCount.objects.filter(**lookup).update(count=models.F("count") + delta)
+        if updated or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                FacetCount.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            FacetCount.objects.filter(**lookup).update(count=models.F("count") + delta)
+
+
+def update_facet_counts(old_state, new_state):
+    """Переносит товар из old_state в new_state (любой из них может быть None)."""
+    if old_state == new_state:
+        return
+    old_root, old_values = old_state or (None, set())
+    new_root, new_values = new_state or (None, set())
+    if old_root == new_root:
+        old_values, new_values = old_values - new_values, new_values - old_values
+    if old_root:
+        _apply_delta(old_root, old_values, -1)
+    if new_root:
+        _apply_delta(new_root, new_values, 1)
+
+
+def shift_in_stock_counts(crossings):
+    """
+    Товары перешли границу «в наличии» при массовом изменении остатков
+    (update() без сигналов, см. store.inventory). crossings – пары
+    (корень, +1 | -1); счётчик in_stock меняется один раз на корень.
+    """
+    totals = Counter()
+    for root_id, delta in crossings:
+        if root_id:
+            totals[root_id] += delta
+    for root_id, delta in totals.items():
+        if delta:
+            _apply_delta(root_id, {("in_stock", "1")}, delta)
+
+
+def active_facet_filters(params, subcategory=None):
+    """
+    Выбранные фасеты {группа: Q}: ?price_bucket=...&in_stock=1&on_sale=1,
+    бренд – выбранная подкатегория.
+    """
+    filters = {}
+    bucket = params.get("price_bucket")
+    for key, _, low, high in PRICE_BUCKETS:
+        if key == bucket:
+            filters["price"] = _bucket_q(low, high)
+            break
+    if params.get("in_stock") == "1":
+        filters["in_stock"] = models.Q(stock__gt=0)
+    if params.get("on_sale") == "1":
+        filters["on_sale"] = ON_SALE_Q
+    if subcategory is not None:
+        filters["brand"] = models.Q(category__path__startswith=subcategory.path)
+    return filters
+
+
+def _other_groups(filters, group):
+    """Фильтры всех выбранных групп, кроме group."""
+    condition = models.Q()
+    for name, q in filters.items():
+        if name != group:
+            condition &= q
+    return condition
+
+
+def _aggregate_kwargs(filters=None):
+    filters = filters or {}
+    kwargs = {
+        "in_stock": models.Count("id", filter=models.Q(stock__gt=0) & _other_groups(filters, "in_stock")),
+        "on_sale": models.Count("id", filter=ON_SALE_Q & _other_groups(filters, "on_sale")),
+    }
+    price = _other_groups(filters, "price")
+    for i, (_, _, low, high) in enumerate(PRICE_BUCKETS):
+        kwargs[f"price_{i}"] = models.Count("id", filter=_bucket_q(low, high) & price)
+    return kwargs
+
+
+def _rows_from_aggregate(row):
+    counts = {("in_stock", "1"): row["in_stock"], ("on_sale", "1"): row["on_sale"]}
+    for i, (key, _, _, _) in enumerate(PRICE_BUCKETS):
+        counts[("price", key)] = row[f"price_{i}"]
+    return counts
+
+
+def _brand_counts(qs):
+    counts = {}
+    for row in qs.order_by().values("category__path").annotate(n=models.Count("id")):
+        brand_id = _brand_id(row["category__path"])
+        if brand_id:
+            counts[str(brand_id)] = counts.get(str(brand_id), 0) + row["n"]
+    return counts
+
+
+@transaction.atomic
+def rebuild_facet_counts(root_ids=None):
+    """Полный пересчёт счётчиков (всех или только указанных корней)."""
+    products = Product.objects.all()
+    stale = FacetCount.objects.all()
+    if root_ids is not None:
+        products = products.filter(root_category_id__in=root_ids)
+        stale = stale.filter(category_id__in=root_ids)
+    stale.delete()
+
+    rows = []
+    per_root = (
+        products.order_by()
+        .values("root_category_id")
+        .annotate(**_aggregate_kwargs())
+    )
+    for row in per_root:
+        root_id = row["root_category_id"]
+        if root_id is None:
+            continue
+        for (facet, value), count in _rows_from_aggregate(row).items():
+            if count:
+                rows.append(FacetCount(category_id=root_id, facet=facet, value=value, count=count))
+        brands = _brand_counts(products.filter(root_category_id=root_id))
+        for value, count in brands.items():
+            rows.append(FacetCount(category_id=root_id, facet="brand", value=value, count=count))
+    FacetCount.objects.bulk_create(rows)
+    return len(rows)
+
+
+def get_facet_counts(qs, category=None, filters=None, live=False):
+    """
+    Счётчики {(фасет, значение): количество}.
+
+    live=False – из FacetCount (один запрос) для всей категории или всего каталога;
+    live=True – по переданному queryset (выдача без фасетных фильтров), два запроса;
+    filters – выбранные фасеты (active_facet_filters), каждая группа считается
+    с фильтрами остальных.
+    """
+    if live:
+        filters = filters or {}
+        counts = _rows_from_aggregate(qs.order_by().aggregate(**_aggregate_kwargs(filters)))
+        if category is not None:
+            for value, count in _brand_counts(qs.filter(_other_groups(filters, "brand"))).items():
+                counts[("brand", value)] = count
+        return counts
+
+    if category is not None:
+        rows = FacetCount.objects.filter(category=category).values_list("facet", "value", "count")
+        return {(facet, value): count for facet, value, count in rows}
+
+    rows = (
+        FacetCount.objects.exclude(facet="brand")
+        .values("facet", "value")
+        .annotate(total=models.Sum("count"))
+    )
+    return {(row["facet"], row["value"]): row["total"] for row in rows}
+
+
+def apply_facet_filters(qs, params):
+    """Фильтры ?price_bucket=...&in_stock=1&on_sale=1."""
+    for q in active_facet_filters(params).values():
+        qs = qs.filter(q)
+    return qs
+
+
+def _toggle_query(params, key, value):
+    """Строка запроса с включённым/выключенным значением фасета и без курсора."""
+    params = params.copy()
+    params.pop("cursor", None)
+    if params.get(key) == value:
+        params.pop(key, None)
+    else:
+        params[key] = value
+    return params.urlencode()
+
+
+def build_facets(counts, params, brands=()):
+    """Данные для сайдбара product_list.html."""
+    price = [
+        {
+            "label": label,
+            "count": counts.get(("price", key), 0),
+            "active": params.get("price_bucket") == key,
+            "query": _toggle_query(params, "price_bucket", key),
+        }
+        for key, label, _, _ in PRICE_BUCKETS
+    ]
+    flags = [
+        {
+            "label": label,
+            "count": counts.get((name, "1"), 0),
+            "active": params.get(name) == "1",
+            "query": _toggle_query(params, name, "1"),
+        }
+        for name, label in (("in_stock", "В наявності"), ("on_sale", "Зі знижкою"))
+    ]
+    brand_items = [
+        {
+            "label": brand.name,
+            "count": counts.get(("brand", str(brand.pk)), 0),
+            "active": params.get("subcategory") == brand.slug,
+            "query": _toggle_query(params, "subcategory", brand.slug),
+        }
+        for brand in brands
+    ]
+    return {"price": price, "flags": flags, "brands": brand_items}
@@ -0,0 +1,126 @@
+"""
+Корзина гостя в сессии.
+
+Пока посетитель не вошёл, корзина – это {product_id: quantity} в
+request.session, строки Cart/CartItem не создаются. При входе или
+регистрации она переносится в корзину пользователя одним bulk upsert
+(merge_guest_cart), количество складывается с уже лежащим в корзине,
+резервы товара (store.reservations) переходят пользователю.
+"""
+from django.db import transaction
+
+from . import reservations
+from .cartsummary import forget_cart_summaries
+from .inventory import with_current_stock
+from .models import Cart, CartItem, Product
+from .pricing import CartPricing
+
+
+SESSION_KEY = "guest_cart"
+
+
+class GuestCartItem:
+    """
+    Позиция гостевой корзины с теми же полями, что store.pricing.price_items
+    добавляет к CartItem.
+    """
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        # В URL update/remove гостевая позиция адресуется id товара
+        self.id = product.pk
+        self.unit_price = product.effective_price
+        self.list_price = product.price
+        self.line_total = product.effective_price * quantity
+        self.line_discount = (product.price - product.effective_price) * quantity
+
+
+def get_quantities(request):
+    """{product_id: quantity} из сессии (без обращения к БД, кроме самой сессии)."""
+    return {int(pk): quantity for pk, quantity in request.session.get(SESSION_KEY, {}).items()}
+
+
+def _save(request, quantities):
+    if quantities:
+        request.session[SESSION_KEY] = {str(pk): quantity for pk, quantity in quantities.items()}
+    else:
+        request.session.pop(SESSION_KEY, None)
+
+
+def has_items(request):
+    return bool(request.session.get(SESSION_KEY))
+
+
+def total_items(request):
+    return sum(get_quantities(request).values())
+
+
+def get_quantity(request, product_id):
+    return get_quantities(request).get(product_id, 0)
+
+
+def set_quantity(request, product_id, quantity):
+    quantities = get_quantities(request)
+    if quantity > 0:
+        quantities[product_id] = quantity
+    else:
+        quantities.pop(product_id, None)
+    _save(request, quantities)
+
+
+def load(request):
+    """CartPricing гостевой корзины для страницы корзины (один запрос)."""
+    quantities = get_quantities(request)
+    products = Product.objects.select_related("category").in_bulk(quantities)
+    items = [
+        GuestCartItem(products[pk], quantity)
+        for pk, quantity in quantities.items()
+        if pk in products
+    ]
+    return CartPricing(items)
+
+
+def merge_guest_cart(request, user):
+    """
+    Переносит гостевую корзину в Cart пользователя.
+    Количества складываются с уже лежащими в корзине и ограничиваются остатком.
+    """
+    quantities = get_quantities(request)
+    if not quantities:
+        return
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        existing = dict(
+            CartItem.objects.filter(cart=cart, product_id__in=quantities)
+            .values_list("product_id", "quantity")
+        )
+        stock = dict(
+            with_current_stock(Product.objects.filter(pk__in=quantities))
+            .values_list("pk", "current_stock")
+        )
+        items = [
+            CartItem(
+                cart=cart,
+                product_id=pk,
+                quantity=min(existing.get(pk, 0) + quantity, stock[pk]),
+            )
+            for pk, quantity in quantities.items()
+            if stock.get(pk)
+        ]
+        CartItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=["cart", "product"],
+            update_fields=["quantity"],
+        )
+        # bulk_create не шлёт сигналов – сводку пересчитываем сами
+        Cart.objects.filter(pk=cart.pk).refresh_summary()
+        forget_cart_summaries([user.pk])
+        # Резервы гостя переходят пользователю на итоговые количества
+        reservations.hold(
+            reservations.user_holder(user),
+            {item.product_id: item.quantity for item in items},
+        )
+        reservations.release(reservations.session_holder(request))
+    _save(request, {})
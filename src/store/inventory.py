@@ -0,0 +1,185 @@
+"""
+Журнал остатков.
+
+Каждое изменение остатка – строка StockMovement (журнал только пополняется):
+- правки в админке и сидинг сохраняют Product.stock как раньше, а сигнал
+  дописывает уже учтённую запись (applied=True);
+- заказ не переписывает строку Product, а добавляет несвёрнутые записи
+  с отрицательным delta.
+
+Product.stock – снимок, по которому работают выдача, фасеты и шаблоны.
+Команда compact_stock периодически сворачивает записи в снимок, сбрасывая
+кэши и счётчики «в наличии» один раз за пачку, а не на каждую продажу.
+Точный остаток для резервов и оформления заказа – снимок плюс несвёрнутые
+записи товара (их немного, частичный индекс stockmovement_pending_idx).
+reconcile_stock сверяет снимок с суммой учтённых записей.
+
+Если свёртка увела бы остаток ниже нуля (после заказа в админке уменьшили
+остаток), снимок обнуляется, а недостача записывается корректирующей
+записью – иначе пачка падала бы на CHECK stock >= 0 при каждом запуске.
+"""
+import logging
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cards import bump_card_versions
+from .facets import shift_in_stock_counts
+from .models import Product, StockMovement
+
+
+logger = logging.getLogger(__name__)
+
+def pending_expression():
+    """Сумма несвёрнутых записей журнала товара OuterRef("pk")."""
+    pending = (
+        StockMovement.objects.filter(product=models.OuterRef("pk"), applied=False)
+        .order_by()
+        .values("product")
+        .annotate(s=models.Sum("delta"))
+        .values("s")
+    )
+    return Coalesce(models.Subquery(pending), 0)
+
+
+def stock_expression():
+    """Точный остаток: снимок Product.stock плюс несвёрнутые записи."""
+    return models.ExpressionWrapper(
+        models.F("stock") + pending_expression(),
+        output_field=models.IntegerField(),
+    )
+
+
+def with_current_stock(products):
+    return products.annotate(current_stock=stock_expression())
+
+
+def pending_delta(product_id):
+    """Сумма несвёрнутых записей товара (отрицательна, если есть заказы)."""
+    return (
+        StockMovement.objects.filter(product_id=product_id, applied=False)
+        .aggregate(s=Coalesce(models.Sum("delta"), 0))["s"]
+    )
+
+
+def record_order(order, quantities):
+    """Списание по заказу {product_id: quantity} – один INSERT."""
+    StockMovement.objects.bulk_create(
+        StockMovement(product_id=pk, delta=-quantity, reason="order", order=order)
+        for pk, quantity in quantities.items()
+    )
+
+
+def record_edit(product, delta, created=False):
+    """Остаток уже записан в Product.stock (админка, сидинг) – учтённая запись."""
+    StockMovement.objects.create(
+        product=product,
+        delta=delta,
+        reason="initial" if created else "manual",
+        applied=True,
+    )
+
+
+def compact(batch_size=1000):
+    """
+    Сворачивает несвёрнутые записи в Product.stock пачками по batch_size.
+    Возвращает число свёрнутых записей.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                StockMovement.objects.select_for_update(skip_locked=True)
+                .filter(applied=False)
+                .order_by("pk")
+                .values_list("pk", "product_id", "delta")[:batch_size]
+            )
+            if not rows:
+                return folded
+            totals = Counter()
+            for _, product_id, delta in rows:
+                totals[product_id] += delta
+            totals = {pk: delta for pk, delta in totals.items() if delta}
+            if totals:
+                _apply(totals)
+            StockMovement.objects.filter(pk__in=[row[0] for row in rows]).update(applied=True)
+        folded += len(rows)
+
+
+def _apply(totals):
+    # pagecache -> guestcart -> reservations -> inventory: импорт здесь
+    from .pagecache import bump_product_generations
+
+    before = {
+        pk: (stock, root_id)
+        for pk, stock, root_id in Product.objects.select_for_update()
+        .filter(pk__in=totals)
+        .order_by("pk")
+        .values_list("pk", "stock", "root_category_id")
+    }
+    # Строки заблокированы – новый остаток можно записать значением
+    after = {pk: max(stock + totals[pk], 0) for pk, (stock, _) in before.items()}
+    Product.objects.filter(pk__in=before).update(
+        stock=models.Case(
+            *(models.When(pk=pk, then=models.Value(stock)) for pk, stock in after.items()),
+            output_field=models.IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    shortfalls = {
+        pk: after[pk] - (stock + totals[pk])
+        for pk, (stock, _) in before.items()
+        if stock + totals[pk] < 0
+    }
+    if shortfalls:
+        logger.warning("Stock went below zero while compacting, clamped: %s", shortfalls)
+        StockMovement.objects.bulk_create(
+            StockMovement(product_id=pk, delta=delta, reason="correction", applied=True)
+            for pk, delta in shortfalls.items()
+        )
+
+    # update() не шлёт сигналов: фасет «в наличии», карточки и страницы – здесь
+    crossings = []
+    for pk, (stock, root_id) in before.items():
+        was, now = stock > 0, after[pk] > 0
+        if was != now:
+            crossings.append((root_id, 1 if now else -1))
+    shift_in_stock_counts(crossings)
+    product_ids = list(before)
+    roots = {root_id for _, root_id in before.values()}
+    transaction.on_commit(lambda: bump_card_versions(product_ids))
+    transaction.on_commit(lambda: bump_product_generations(*roots))
+
+
+def ledger_mismatches():
+    """Товары, у которых снимок не равен сумме учтённых записей: [(id, снимок, журнал)]."""
+    applied = (
+        StockMovement.objects.filter(product=models.OuterRef("pk"), applied=True)
+        .order_by()
+        .values("product")
+        .annotate(s=models.Sum("delta"))
+        .values("s")
+    )
+    return list(
+        Product.objects.annotate(ledger=Coalesce(models.Subquery(applied), 0))
+        .exclude(stock=models.F("ledger"))
+        .order_by("pk")
+        .values_list("pk", "stock", "ledger")
+    )
+
+
+def reconcile(fix=False):
+    """
+    Сверяет снимки с журналом. С fix=True дописывает корректирующие записи,
+    чтобы журнал объяснял фактический Product.stock (например, после update()
+    в обход журнала). Возвращает список расхождений.
+    """
+    mismatches = ledger_mismatches()
+    if fix and mismatches:
+        StockMovement.objects.bulk_create(
+            StockMovement(product_id=pk, delta=stock - ledger, reason="correction", applied=True)
+            for pk, stock, ledger in mismatches
+        )
+    return mismatches
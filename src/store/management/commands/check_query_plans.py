@@ -0,0 +1,260 @@
+import json
+import re
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from store.models import Cart, CartItem, Category, Favorite, Order, OrderItem, Product
+
+
+# Маленькие справочные таблицы: полный просмотр для них нормален
+SMALL_TABLES = {
+    "store_category",
+    "store_footersection",
+    "store_footerlink",
+    "store_page",
+    "store_facetcount",
+    "django_content_type",
+}
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+SQLITE_TABLE = re.compile(r"^(?:SCAN|SEARCH) (\w+)")
+
+
+class Rollback(Exception):
+    """Откатывает сгенерированный каталог после проверки."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN for every query issued by the hot catalog/order pages on a seeded "
+        "large catalog and fails if any query falls back to a full table scan or a temp sort"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=20000,
+            help='Number of products to generate for the check (default: 20000).',
+        )
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Use the existing data instead of generating a temporary catalog.',
+        )
+
+    def handle(self, *args, **options):
+        self.failures = []
+        try:
+            with transaction.atomic():
+                if connection.vendor == "postgresql":
+                    with connection.cursor() as cursor:
+                        # Без seq scan/sort планировщик выбирает их только если нет индекса
+                        cursor.execute("SET LOCAL enable_seqscan = off")
+                        cursor.execute("SET LOCAL enable_sort = off")
+                if options['no_seed']:
+                    user = User.objects.filter(orders__isnull=False).first() or User.objects.first()
+                else:
+                    user = self._seed(options['products'])
+                    with connection.cursor() as cursor:
+                        cursor.execute("ANALYZE")
+                self._check_pages(user)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if self.failures:
+            for page, sql, problems in self.failures:
+                self.stdout.write(self.style.ERROR(f"[{page}] {'; '.join(problems)}"))
+                self.stdout.write(f"    {sql}")
+            raise CommandError(f"{len(self.failures)} queries without a usable index")
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes"))
+
+    # ------------------------------------------------------------------ seed
+
+    def _seed(self, total):
+        self.stdout.write(f"Generating {total} products...")
+        subcategories = []
+        for r in range(5):
+            root = Category.objects.create(name=f"Plan root {r}", slug=f"plan-root-{r}")
+            for s in range(5):
+                subcategories.append(
+                    Category.objects.create(name=f"Plan sub {r}-{s}", slug=f"plan-sub-{r}-{s}", parent=root)
+                )
+
+        products = []
+        for i in range(total):
+            category = subcategories[i % len(subcategories)]
+            price = Decimal(500 + (i * 37) % 60000)
+            sale_price = price * Decimal("0.9") if i % 7 == 0 else None
+            product = Product(
+                category=category,
+                root_category_id=category.root_id,
+                name=f"Plan product {i}",
+                description="x" * 200,
+                price=price,
+                sale_price=sale_price,
+                stock=i % 5,
+                popularity=float(i % 997),
+            )
+            product.sync_prices()
+            product.sync_search_key()
+            products.append(product)
+        Product.objects.bulk_create(products, batch_size=1000)
+
+        # Покупатели с корзинами, избранным и заказами, чтобы выборка по
+        # пользователю была селективной, как в рабочей базе
+        users = User.objects.bulk_create(
+            User(username=f"plan-check-{i}", password="!") for i in range(300)
+        )
+        product_ids = list(Product.objects.values_list("id", flat=True)[:500])
+        carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+        orders = Order.objects.bulk_create(
+            Order(user=user, total_price=Decimal("100")) for user in users for _ in range(5)
+        )
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product_id=product_ids[(i + j) % len(product_ids)])
+            for i, cart in enumerate(carts) for j in range(5)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=user, product_id=product_ids[(i * 3 + j) % len(product_ids)])
+            for i, user in enumerate(users) for j in range(10)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product_id=product_ids[(i + j) % len(product_ids)],
+                sku=str(product_ids[(i + j) % len(product_ids)]),
+                product_name="Товар",
+                category_name="Категория",
+                quantity=1,
+                price=Decimal("100"),
+            )
+            for i, order in enumerate(orders) for j in range(3)
+        )
+        return users[0]
+
+    # ----------------------------------------------------------------- pages
+
+    def _hot_pages(self):
+        root = Category.objects.filter(parent__isnull=True).order_by("id").first()
+        sub = Category.objects.filter(parent=root).order_by("id").first() if root else None
+        product = Product.objects.order_by("id").first()
+        order = Order.objects.order_by("id").first()
+
+        pages = [("index", "/"), ("category_list", "/categories/")]
+        for sort in ("popular", "price_asc", "price_desc", "new"):
+            pages.append((f"product_list sort={sort}", f"/products/?sort={sort}"))
+            if root:
+                pages.append((
+                    f"product_list category sort={sort}",
+                    f"/products/?category={root.slug}&sort={sort}",
+                ))
+                pages.append((
+                    f"products_api category sort={sort} page 2",
+                    ("cursor", f"/api/products/?category={root.slug}&sort={sort}"),
+                ))
+            pages.append((f"products_api sort={sort} page 2", ("cursor", f"/api/products/?sort={sort}")))
+        if root:
+            pages.append(("index category", f"/?category={root.slug}"))
+            pages.append((
+                "product_list price range",
+                f"/products/?category={root.slug}&sort=price_asc&min_price=1000&max_price=5000",
+            ))
+            pages.append((
+                "product_list facets",
+                f"/products/?category={root.slug}&in_stock=1&on_sale=1",
+            ))
+        if sub:
+            pages.append((
+                "product_list subcategory",
+                f"/products/?category={root.slug}&subcategory={sub.slug}",
+            ))
+        if product:
+            pages.append(("product_detail", f"/products/{product.id}/"))
+        pages += [
+            ("cart_detail", "/cart/"),
+            ("order_list", "/orders/"),
+            ("favorites_list", "/favorites/"),
+            ("profile", "/accounts/profile/"),
+        ]
+        if order:
+            pages.append(("order_detail", f"/orders/{order.id}/"))
+        return pages
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def _check_pages(self, user):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+
+        for name, url in self._hot_pages():
+            if isinstance(url, tuple):
+                # Вторая страница keyset-пагинации: курсор берём из первой
+                url = url[1]
+                cursor = client.get(url).json().get("next_cursor")
+                if not cursor:
+                    continue
+                url = f"{url}&cursor={cursor}"
+
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            if response.status_code >= 400:
+                self.failures.append((name, url, [f"HTTP {response.status_code}"]))
+                continue
+
+            checked = 0
+            for query in ctx.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                problems = self._explain(sql)
+                checked += 1
+                if problems:
+                    self.failures.append((name, sql, problems))
+            self.stdout.write(f"  {name}: {checked} queries")
+
+    # --------------------------------------------------------------- explain
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                return self._sqlite_problems(row[-1] for row in cursor.fetchall())
+            if connection.vendor == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return self._postgres_problems(plan[0]["Plan"])
+        raise CommandError(f"EXPLAIN is not supported for {connection.vendor}")
+
+    def _sqlite_problems(self, details):
+        details = list(details)
+        tables = {m.group(1) for m in map(SQLITE_TABLE.match, details) if m}
+        if tables and tables <= SMALL_TABLES:
+            return []
+        problems = []
+        for detail in details:
+            match = SQLITE_FULL_SCAN.match(detail)
+            if match and match.group(1) not in SMALL_TABLES:
+                problems.append(f"full scan: {detail}")
+            elif "TEMP B-TREE" in detail and "ORDER BY" in detail:
+                problems.append(f"temp sort: {detail}")
+        return problems
+
+    def _postgres_problems(self, node, parent=None):
+        problems = []
+        node_type = node.get("Node Type")
+        if node_type == "Seq Scan" and node.get("Relation Name") not in SMALL_TABLES:
+            problems.append(f"full scan: {node.get('Relation Name')}")
+        elif node_type in ("Sort", "Incremental Sort") and (parent or {}).get("Node Type") != "Aggregate":
+            problems.append(f"temp sort: {', '.join(node.get('Sort Key', []))}")
+        for child in node.get("Plans", []):
+            problems += self._postgres_problems(child, node)
+        return problems
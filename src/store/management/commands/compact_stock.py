@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from store.inventory import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds pending stock movements (orders) into Product.stock (run from cron every minute). "
+        "Card and page invalidation reaches web workers through the shared cache (see CACHES)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Movements folded per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        folded = compact(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} stock movements"))
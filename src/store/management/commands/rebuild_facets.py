@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from store.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = "Recomputes precomputed facet counts (brand, price bucket, in stock, on sale)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category',
+            type=int,
+            action='append',
+            dest='categories',
+            help='Root category id to rebuild (can be repeated). Rebuilds all by default.',
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts(root_ids=options.get('categories'))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet count rows"))
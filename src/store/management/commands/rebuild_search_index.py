@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product full-text search index (FTS5 on SQLite, tsvector on PostgreSQL)"
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            self.stdout.write(self.style.WARNING("No full-text backend for this database, search uses icontains"))
+            return
+        rows = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {rows} products"))
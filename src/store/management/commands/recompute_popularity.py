@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.popularity import recompute_popularity
+
+
+class Command(BaseCommand):
+    help = "Recomputes time-decayed product popularity scores from order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only count orders from the last N days (older sales have negligible weight).',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days']:
+            since = timezone.now() - timedelta(days=options['days'])
+        products = recompute_popularity(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed popularity for {products} products"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.inventory import reconcile
+
+
+class Command(BaseCommand):
+    help = "Checks that every Product.stock snapshot equals the sum of its applied stock movements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Append correction movements so the ledger matches the current stock.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = reconcile(fix=options['fix'])
+        for product_id, stock, ledger in mismatches:
+            self.stdout.write(f"Product {product_id}: stock {stock}, ledger {ledger}")
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Stock matches the ledger"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Recorded {len(mismatches)} corrections"))
+        else:
+            raise CommandError(f"{len(mismatches)} products differ from the ledger")
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.analytics import search_rollup
+from store.models import SearchEvent
+
+
+class Command(BaseCommand):
+    help = "Reports top search queries, zero-result queries and search latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Report window in days.')
+        parser.add_argument('--limit', type=int, default=20, help='Queries per list.')
+        parser.add_argument(
+            '--source',
+            choices=[choice for choice, _ in SearchEvent.SOURCE_CHOICES] + ['all'],
+            default='catalog',
+            help=(
+                'Event source (default: catalog). Autocomplete records every typed prefix, '
+                'so its top queries are mostly partial words.'
+            ),
+        )
+        parser.add_argument(
+            '--prune-days',
+            type=int,
+            help='Delete events older than this many days after reporting.',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        rollup = search_rollup(
+            now - timedelta(days=options['days']),
+            limit=options['limit'],
+            source=None if options['source'] == 'all' else options['source'],
+        )
+        total = rollup['total']
+        self.stdout.write(f"Searches in the last {options['days']} days: {total}")
+        if total:
+            self.stdout.write(f"Zero-result searches: {rollup['zero']} ({rollup['zero'] * 100 / total:.1f}%)")
+            latency = ", ".join(f"p{p} {ms:.1f} ms" for p, ms in rollup['latency'].items())
+            self.stdout.write(f"Latency: {latency}")
+
+        self.stdout.write("\nTop queries:")
+        for row in rollup['top']:
+            self.stdout.write(f"  {row['searches']:>7}  {row['query']}  (zero results: {row['zero']})")
+        self.stdout.write("\nZero-result queries:")
+        for row in rollup['zero_results']:
+            self.stdout.write(f"  {row['zero']:>7}  {row['query']}")
+
+        if options['prune_days'] is not None:
+            deleted, _ = SearchEvent.objects.filter(
+                created_at__lt=now - timedelta(days=options['prune_days'])
+            ).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} old search events"))
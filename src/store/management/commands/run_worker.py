@@ -0,0 +1,78 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from store.tasks import claim, requeue_stale, run_pending, run_task
+
+
+class Command(BaseCommand):
+    help = "Runs queued background tasks (order emails etc.) until stopped with SIGINT/SIGTERM"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of worker threads (default: 1).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1).',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the tasks that are ready now and exit.',
+        )
+
+    def handle(self, *args, **options):
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        if options['once']:
+            requeue_stale()
+            done = run_pending(name, limit=10 ** 9)
+            self.stdout.write(self.style.SUCCESS(f"Ran {done} tasks"))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{name}:{index}", stop, options['poll_interval']),
+                name=f"worker-{index}",
+            )
+            for index in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Worker {name} started with {len(threads)} threads")
+
+        while not stop.wait(60):
+            requeue_stale()
+            close_old_connections()
+        for thread in threads:
+            thread.join()
+        connection.close()
+        self.stdout.write("Worker stopped")
+
+    def work(self, worker, stop, poll_interval):
+        # У каждого потока своё соединение с БД
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                tasks = claim(worker)
+                if not tasks:
+                    stop.wait(poll_interval)
+                    continue
+                for task in tasks:
+                    run_task(task)
+        finally:
+            connection.close()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from store.reservations import sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes expired stock reservations (run from cron every few minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per statement.',
+        )
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired reservations"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    """Заполняет path/depth категорий и root_category товаров."""
+    Category = apps.get_model('store', 'Category')
+    Product = apps.get_model('store', 'Product')
+
+    level = list(Category.objects.filter(parent__isnull=True))
+    prefixes = {}
+    depth = 0
+    while level:
+        for category in level:
+            category.path = f"{prefixes.get(category.parent_id, '')}{category.pk:08d}/"
+            category.depth = depth
+            prefixes[category.pk] = category.path
+        Category.objects.bulk_update(level, ['path', 'depth'])
+        level = list(Category.objects.filter(parent_id__in=[c.pk for c in level]))
+        depth += 1
+
+    for root in Category.objects.filter(parent__isnull=True):
+        Product.objects.filter(category__path__startswith=root.path).update(root_category_id=root.pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_favorite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='root_category',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.category', verbose_name='Корневая категория'),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Снимок правил store.facets на момент миграции: код приложения может
+# измениться, а миграция должна давать тот же результат
+PRICE_BUCKETS = [
+    ("0-1000", 0, 1000),
+    ("1000-5000", 1000, 5000),
+    ("5000-10000", 5000, 10000),
+    ("10000-20000", 10000, 20000),
+    ("20000-40000", 20000, 40000),
+    ("40000+", 40000, None),
+]
+PATH_STEP = 9  # 8 цифр id и "/"
+
+
+def facet_values(path, price, sale_price, stock):
+    on_sale = sale_price is not None and sale_price < price and price > 0
+    effective = sale_price if on_sale else price
+    bucket = PRICE_BUCKETS[0][0]
+    for key, low, high in PRICE_BUCKETS:
+        if effective >= low and (high is None or effective < high):
+            bucket = key
+            break
+    values = {('price', bucket)}
+    brand = path[PATH_STEP:2 * PATH_STEP - 1]
+    if brand:
+        values.add(('brand', str(int(brand))))
+    if stock > 0:
+        values.add(('in_stock', '1'))
+    if on_sale:
+        values.add(('on_sale', '1'))
+    return values
+
+
+def fill_facet_counts(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    FacetCount = apps.get_model('store', 'FacetCount')
+
+    counts = {}
+    rows = Product.objects.filter(root_category__isnull=False).values_list(
+        'root_category_id', 'category__path', 'price', 'sale_price', 'stock'
+    )
+    for root_id, path, price, sale_price, stock in rows.iterator():
+        for facet, value in facet_values(path, price, sale_price, stock):
+            key = (root_id, facet, value)
+            counts[key] = counts.get(key, 0) + 1
+
+    FacetCount.objects.bulk_create(
+        FacetCount(category_id=root_id, facet=facet, value=value, count=count)
+        for (root_id, facet, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_category_path_product_root_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('brand', 'Бренд'), ('price', 'Ценовой диапазон'), ('in_stock', 'В наличии'), ('on_sale', 'Со скидкой')], max_length=20, verbose_name='Фасет')),
+                ('value', models.CharField(max_length=50, verbose_name='Значение')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество товаров')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='store.category', verbose_name='Корневая категория')),
+            ],
+            options={
+                'verbose_name': 'Счётчик фасета',
+                'verbose_name_plural': 'Счётчики фасетов',
+                'unique_together': {('category', 'facet', 'value')},
+            },
+        ),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
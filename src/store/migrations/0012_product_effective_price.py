@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Floor
+
+
+def fill_effective_prices(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    discounted = models.Q(sale_price__isnull=False, sale_price__lt=models.F('price'), price__gt=0)
+    Product.objects.update(
+        effective_price=models.Case(
+            models.When(discounted, then=models.F('sale_price')),
+            default=models.F('price'),
+        ),
+        discount_percent=models.Case(
+            models.When(
+                discounted,
+                then=Cast(
+                    Floor((models.F('price') - models.F('sale_price')) * 100 / models.F('price')),
+                    models.PositiveSmallIntegerField(),
+                ),
+            ),
+            default=models.Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percent',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Скидка, %'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Фактическая цена'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_effective_price_idx'),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+    ]
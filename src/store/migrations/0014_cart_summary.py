@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_cart_summary(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    items = CartItem.objects.filter(cart=models.OuterRef('pk')).order_by().values('cart')
+    Cart.objects.update(
+        total_items=Coalesce(
+            models.Subquery(items.annotate(s=models.Sum('quantity')).values('s')),
+            0,
+        ),
+        total_price=Coalesce(
+            models.Subquery(
+                items.annotate(s=models.Sum(models.F('quantity') * models.F('product__price'))).values('s')
+            ),
+            models.Value(0, output_field=models.DecimalField()),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_catalog_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Товаров'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Сумма'),
+        ),
+        migrations.RunPython(fill_cart_summary, migrations.RunPython.noop),
+    ]
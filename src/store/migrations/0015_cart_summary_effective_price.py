@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:25
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def refresh_cart_totals(apps, schema_editor):
+    # Сводка корзины теперь считается по effective_price (см. store.pricing)
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    items = CartItem.objects.filter(cart=models.OuterRef('pk')).order_by().values('cart')
+    line_total = models.ExpressionWrapper(
+        models.F('quantity') * models.F('product__effective_price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+    Cart.objects.update(
+        total_price=Coalesce(
+            models.Subquery(items.annotate(s=models.Sum(line_total)).values('s')),
+            models.Value(0, output_field=models.DecimalField()),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_cart_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_cart_totals, migrations.RunPython.noop),
+    ]
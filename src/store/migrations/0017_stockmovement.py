@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """Текущие остатки – первая, уже учтённая запись журнала каждого товара."""
+    Product = apps.get_model('store', 'Product')
+    StockMovement = apps.get_model('store', 'StockMovement')
+    rows = Product.objects.exclude(stock=0).values_list('pk', 'stock').order_by('pk').iterator(chunk_size=1000)
+    batch = []
+    for product_id, stock in rows:
+        batch.append(StockMovement(product_id=product_id, delta=stock, reason='initial', applied=True))
+        if len(batch) >= 1000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Изменение')),
+                ('reason', models.CharField(choices=[('initial', 'Начальный остаток'), ('manual', 'Правка остатка'), ('order', 'Заказ'), ('correction', 'Сверка')], max_length=20, verbose_name='Причина')),
+                ('applied', models.BooleanField(default=False, verbose_name='Учтено в остатке')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.order', verbose_name='Заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='store.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Движение остатка',
+                'verbose_name_plural': 'Движения остатков',
+                'indexes': [models.Index(condition=models.Q(('applied', False)), fields=['product'], name='stockmovement_pending_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
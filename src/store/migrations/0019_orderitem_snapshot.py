@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def snapshot_order_items(apps, schema_editor):
+    OrderItem = apps.get_model('store', 'OrderItem')
+    Product = apps.get_model('store', 'Product')
+    product = Product.objects.filter(pk=models.OuterRef('product_id'))
+    OrderItem.objects.filter(product__isnull=False).update(
+        sku=Cast('product_id', models.CharField(max_length=50)),
+        product_name=models.Subquery(product.values('name')[:1]),
+        category_name=models.Subquery(product.values('category__name')[:1]),
+        product_image=models.Subquery(product.values('image')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Категория'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image',
+            field=models.ImageField(blank=True, upload_to='products/', verbose_name='Изображение'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=200, verbose_name='Товар'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='sku',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Артикул'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.product'),
+        ),
+        migrations.RunPython(snapshot_order_items, migrations.RunPython.noop),
+    ]
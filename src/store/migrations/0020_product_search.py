@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:30
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_search USING fts5(name, description)"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_search (rowid, name, description) "
+            "SELECT id, name, description FROM store_product"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE store_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES store_product (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX store_product_search_document_idx "
+            "ON store_product_search USING gin (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_search (product_id, document) "
+            "SELECT id, setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B') FROM store_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS store_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_orderitem_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
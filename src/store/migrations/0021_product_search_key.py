@@ -0,0 +1,161 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:45
+
+import re
+
+from django.db import migrations, models
+
+
+# Снимок store.transliteration на момент миграции: код приложения может
+# измениться, а миграция должна давать тот же ключ.
+# Буквы и цифры: знаки препинания и операторы FTS в слова не попадают
+WORD_RE = re.compile(r"[^\W_]+")
+PARTS_RE = re.compile(r"\d+|[^\W\d_]+")
+CYRILLIC_RE = re.compile(r"[а-яёіїєґ]")
+LATIN_RE = re.compile(r"[a-z]")
+
+FOLD = str.maketrans({
+    "ь": None, "ъ": None,
+    "ё": "е", "э": "е", "є": "е",
+    "ы": "и", "і": "и", "ї": "и", "й": "и",
+    "ґ": "г",
+})
+
+RU_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "і": "i", "ї": "yi", "є": "ye", "ґ": "g",
+}
+# Украинская транслитерация отличается г, и, х
+UK_TO_LATIN = {**RU_TO_LATIN, "г": "h", "и": "y", "х": "kh"}
+
+# Сначала буквосочетания, потом одиночные буквы
+LATIN_TO_CYRILLIC = (
+    ("shch", "щ"), ("sch", "щ"),
+    ("sh", "ш"), ("ch", "ч"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"),
+    ("ph", "ф"), ("th", "т"), ("ck", "к"), ("ee", "и"), ("oo", "у"),
+    ("ya", "я"), ("yu", "ю"), ("yo", "е"),
+    ("ce", "се"), ("ci", "си"), ("cy", "си"),
+    ("a", "а"), ("b", "б"), ("c", "к"), ("d", "д"), ("e", "е"), ("f", "ф"),
+    ("g", "г"), ("h", "х"), ("i", "и"), ("j", "дж"), ("k", "к"), ("l", "л"),
+    ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"), ("q", "к"), ("r", "р"),
+    ("s", "с"), ("t", "т"), ("u", "у"), ("v", "в"), ("w", "в"), ("x", "кс"),
+    ("y", "и"), ("z", "з"),
+)
+LATIN_TO_CYRILLIC_RE = re.compile("|".join(latin for latin, _ in LATIN_TO_CYRILLIC))
+LATIN_TO_CYRILLIC_MAP = dict(LATIN_TO_CYRILLIC)
+
+# Написания, которые побуквенная транслитерация не даёт
+ALIASES = {
+    "iphone": ("айфон",),
+    "ipad": ("айпад",),
+    "imac": ("аймак",),
+    "macbook": ("макбук",),
+    "airpods": ("аирподс", "эирподс"),
+    "apple": ("эпл", "эппл"),
+    "xiaomi": ("сяоми", "ксиоми"),
+    "huawei": ("хуавеи",),
+    "realme": ("рилми",),
+    "buds": ("бадс",),
+    "watch": ("вотч",),
+}
+
+
+def to_latin(word, table):
+    return "".join(table.get(char, char) for char in word)
+
+
+def to_cyrillic(word):
+    return LATIN_TO_CYRILLIC_RE.sub(lambda match: LATIN_TO_CYRILLIC_MAP[match.group()], word)
+
+
+def spellings(word):
+    result = [word]
+    if CYRILLIC_RE.search(word):
+        result += [to_latin(word, RU_TO_LATIN), to_latin(word, UK_TO_LATIN)]
+    if LATIN_RE.search(word):
+        result.append(to_cyrillic(word))
+        result.extend(ALIASES.get(word, ()))
+    for spelling in list(result):
+        parts = PARTS_RE.findall(spelling)
+        if len(parts) > 1:
+            result.extend(parts)
+    return [spelling.translate(FOLD) for spelling in result]
+
+
+def search_key(*texts):
+    key = {}
+    for text in texts:
+        for word in WORD_RE.findall((text or "").lower()):
+            key.update(dict.fromkeys(spellings(word)))
+    key.pop("", None)
+    return " ".join(key)
+
+
+def fill_search_keys(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.select_related('category').only('pk', 'name', 'category__name'))
+    for product in products:
+        product.search_key = search_key(product.name, product.category.name)
+    Product.objects.bulk_update(products, ['search_key'], batch_size=500)
+
+
+def index_search_keys(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # В FTS5 нельзя добавить колонку – пересоздаём таблицу
+        schema_editor.execute("DROP TABLE store_product_search")
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_search USING fts5(name, description, search_key)"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_search (rowid, name, description, search_key) "
+            "SELECT id, name, description, search_key FROM store_product"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE store_product_search s SET document = "
+            "setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') || "
+            "setweight(to_tsvector('simple', p.search_key), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(p.description, '')), 'C') "
+            "FROM store_product p WHERE p.id = s.product_id"
+        )
+
+
+def unindex_search_keys(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE store_product_search")
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_search USING fts5(name, description)"
+        )
+        schema_editor.execute(
+            "INSERT INTO store_product_search (rowid, name, description) "
+            "SELECT id, name, description FROM store_product"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE store_product_search s SET document = "
+            "setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(p.description, '')), 'B') "
+            "FROM store_product p WHERE p.id = s.product_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_key',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Ключ поиска'),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.RunPython(index_search_keys, unindex_search_keys),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_product_search_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, verbose_name='Запрос')),
+                ('source', models.CharField(choices=[('suggest', 'Автодополнение'), ('catalog', 'Каталог')], max_length=10, verbose_name='Источник')),
+                ('results', models.PositiveIntegerField(verbose_name='Найдено')),
+                ('duration_ms', models.FloatField(verbose_name='Время ответа, мс')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Поисковый запрос',
+                'verbose_name_plural': 'Поисковые запросы',
+                'indexes': [models.Index(fields=['created_at'], name='searchevent_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_searchevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='views',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+        migrations.CreateModel(
+            name='ProductViewHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Просмотры за час',
+                'verbose_name_plural': 'Просмотры по часам',
+                'indexes': [models.Index(fields=['hour'], name='productviewhour_hour_idx')],
+                'unique_together': {('product', 'hour')},
+            },
+        ),
+    ]
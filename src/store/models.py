@@ -1,5 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Concat, Substr
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .pricing import line_total_expression
+from .transliteration import search_key
+
+
+# Ширина одного сегмента материализованного пути: id, дополненный нулями
+CATEGORY_PATH_STEP = 8
 
 
 class Category(models.Model):
@@ -8,6 +17,9 @@ class Category(models.Model):
     Поддерживает подкатегории через поле parent:
     - parent = NULL  -> корневая категория (например, "Мобильные телефоны")
     - parent != NULL -> подкатегория (например, "Apple", "Samsung" и т.п.)
+
+    path – материализованный путь от корня ("00000001/00000007/"),
+    поэтому все потомки узла на любой глубине – это path__startswith=node.path.
     """
     name = models.CharField(max_length=100, verbose_name="Название")
     slug = models.SlugField(unique=True)
@@ -19,6 +31,8 @@ class Category(models.Model):
         blank=True,
         verbose_name="Родительская категория",
     )
+    path = models.CharField(max_length=255, db_index=True, editable=False, default="")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = "Категория"
@@ -34,6 +48,88 @@ class Category(models.Model):
         """Является ли категория корневой (без родителя)."""
         return self.parent is None
 
+    @property
+    def root_id(self):
+        """id корневой категории, взятый из path."""
+        return int(self.path[:CATEGORY_PATH_STEP]) if self.path else self.pk
+
+    def get_descendants(self, include_self=True):
+        """Все потомки на любой глубине одним индексированным запросом."""
+        qs = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+
+    def _build_path(self):
+        prefix = self.parent.path if self.parent_id else ""
+        return f"{prefix}{self.pk:0{CATEGORY_PATH_STEP}d}/"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            old_path = self.path
+            new_path = self._build_path()
+            if new_path == old_path:
+                return
+
+            self.path = new_path
+            self.depth = new_path.count("/") - 1
+            Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+            if old_path:
+                # Перенос узла: переписываем пути всего поддерева
+                descendants = Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk)
+                descendants.update(
+                    path=Concat(models.Value(new_path), Substr("path", len(old_path) + 1)),
+                    depth=models.F("depth") + (self.depth - (old_path.count("/") - 1)),
+                )
+            Product.objects.filter(category__path__startswith=new_path).update(
+                root_category_id=self.root_id
+            )
+            if old_path:
+                # Товары поддерева сменили корень/бренд – пересчитываем фасеты обоих
+                # корней и забываем закэшированные корни их страниц
+                from .facets import rebuild_facet_counts
+                from .pagecache import forget_product_roots
+                rebuild_facet_counts(root_ids={int(old_path[:CATEGORY_PATH_STEP]), self.root_id})
+                moved = list(
+                    Product.objects.filter(category__path__startswith=new_path).values_list("pk", flat=True)
+                )
+                transaction.on_commit(lambda: forget_product_roots(moved))
+
+
+# Поля карточки товара в списках. description (TextField без ограничения)
+# сюда намеренно не входит; popularity/created_at нужны курсорам пагинации.
+LISTING_FIELDS = (
+    "id",
+    "category",
+    "category__name",
+    "name",
+    "price",
+    "effective_price",
+    "discount_percent",
+    "stock",
+    "image",
+    "popularity",
+    "created_at",
+)
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Облегчённая выборка для карточек: только LISTING_FIELDS и имя категории."""
+        return self.select_related("category").only(*LISTING_FIELDS)
+
+    def in_category(self, category):
+        """
+        Товары категории и всех её потомков.
+        Для корня – фильтр по денормализованному root_category без JOIN.
+        """
+        if category.parent_id is None:
+            return self.filter(root_category_id=category.pk)
+        return self.filter(category__path__startswith=category.path)
+
+
 class Product(models.Model):
     category = models.ForeignKey(
         Category,
@@ -41,6 +137,16 @@ class Product(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Категория",
     )
+    # Денормализованный корень дерева категорий, поддерживается в save()
+    root_category = models.ForeignKey(
+        Category,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Корневая категория",
+    )
     name = models.CharField(max_length=200, verbose_name="Название")
     description = models.TextField(blank=True, verbose_name="Описание")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
@@ -52,6 +158,22 @@ class Product(models.Model):
         verbose_name="Акционная цена",
         help_text="Оставьте пустым, если товара нет на скидке",
     )
+    # Фактическая цена и процент скидки хранятся в БД, чтобы фильтровать и
+    # сортировать по ним с индексом; пересчитываются в save()
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Фактическая цена",
+    )
+    discount_percent = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Скидка, %",
+    )
+    # Снимок остатка: продажи пишутся в журнал StockMovement и попадают
+    # сюда при свёртке (см. store.inventory)
     stock = models.PositiveIntegerField(default=0, verbose_name="Количество на складе")
     # Main image (optional, for backward compatibility or as a thumbnail)
     image = models.ImageField(
@@ -60,26 +182,71 @@ class Product(models.Model):
         null=True,
         verbose_name="Фото товара",
     )
+    # Рейтинг продаж с затуханием во времени (см. store.popularity)
+    popularity = models.FloatField(default=0, editable=False, verbose_name="Популярность")
+    # Просмотры страницы товара; копятся в памяти воркера и пишутся
+    # пачкой (см. store.analytics), почасовые – в ProductViewHour
+    views = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Просмотры")
+    # Слова названия и категории в разных написаниях (см. store.transliteration);
+    # входит в полнотекстовый индекс, пересчитывается в save()
+    search_key = models.TextField(blank=True, default="", editable=False, verbose_name="Ключ поиска")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлен")
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Сортировки каталога (tie-breaker id – для keyset-пагинации)
+            models.Index(fields=["-popularity", "-id"], name="product_popularity_idx"),
+            models.Index(fields=["effective_price", "id"], name="product_effective_price_idx"),
+            models.Index(fields=["-created_at", "-id"], name="product_created_idx"),
+            # Те же сортировки внутри корневой категории
+            models.Index(fields=["root_category", "-popularity", "-id"], name="product_root_popularity_idx"),
+            models.Index(fields=["root_category", "effective_price", "id"], name="product_root_price_idx"),
+            models.Index(fields=["root_category", "-created_at", "-id"], name="product_root_created_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.root_category_id = self.category.root_id
+        self.sync_prices()
+        self.sync_search_key()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"price", "sale_price"} & set(update_fields):
+            update_fields = kwargs["update_fields"] = {*update_fields, "effective_price", "discount_percent"}
+        if update_fields is not None and {"category", "category_id"} & set(update_fields):
+            update_fields = kwargs["update_fields"] = {*update_fields, "root_category"}
+        if update_fields is not None and {"name", "category", "category_id"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_key"}
+        super().save(*args, **kwargs)
+
+    def sync_prices(self):
+        """Пересчитывает хранимые effective_price и discount_percent."""
+        if self.sale_price is not None and self.sale_price < self.price and self.price > 0:
+            self.effective_price = self.sale_price
+            self.discount_percent = int((self.price - self.sale_price) / self.price * 100)
+        else:
+            self.effective_price = self.price
+            self.discount_percent = 0
+
+    def sync_search_key(self):
+        """Пересчитывает хранимый ключ поиска."""
+        self.search_key = search_key(self.name, self.category.name)
+
     def has_discount(self):
         """Есть ли активная скидка."""
-        return self.sale_price is not None and self.sale_price < self.price
+        return self.effective_price < self.price
 
     def get_discount_percentage(self):
         """Процент скидки для бейджа."""
-        if self.has_discount():
-            discount = ((self.price - self.sale_price) / self.price) * 100
-            return int(discount)
-        return 0
+        return self.discount_percent
 
     def get_effective_price(self):
         """Фактическая цена (учитывая скидку)."""
-        return self.sale_price if self.has_discount() else self.price
+        return self.effective_price
 
 class ProductImage(models.Model):
     """
@@ -94,19 +261,49 @@ class ProductImage(models.Model):
         verbose_name_plural = "Изображения товара"
 
 
+class CartQuerySet(models.QuerySet):
+    def refresh_summary(self):
+        """
+        Пересчитывает total_items/total_price корзин одним UPDATE по их позициям.
+        Вызывается после любого изменения CartItem (см. store.signals).
+        """
+        items = CartItem.objects.filter(cart=models.OuterRef("pk")).order_by().values("cart")
+        return self.update(
+            total_items=Coalesce(
+                models.Subquery(items.annotate(s=models.Sum("quantity")).values("s")),
+                0,
+            ),
+            total_price=Coalesce(
+                models.Subquery(items.annotate(s=models.Sum(line_total_expression())).values("s")),
+                models.Value(0, output_field=models.DecimalField()),
+            ),
+        )
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    # Сводка для бейджа в шапке – поддерживается refresh_summary()
+    total_items = models.PositiveIntegerField(default=0, editable=False, verbose_name="Товаров")
+    total_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Сумма"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Корзина {self.user.username}"
 
+    def refresh_summary(self):
+        Cart.objects.filter(pk=self.pk).refresh_summary()
+        self.refresh_from_db(fields=["total_items", "total_price"])
+
     def get_total_price(self):
-        return sum(item.get_total_price() for item in self.items.all())
+        return self.total_price
 
     def get_total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.total_items
 
 
 class CartItem(models.Model):
@@ -122,7 +319,8 @@ class CartItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
     def get_total_price(self):
-        return self.product.price * self.quantity
+        # Та же формула, что и store.pricing.line_total_expression
+        return self.product.effective_price * self.quantity
 
 
 class Order(models.Model):
@@ -141,19 +339,44 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id} - {self.user.username}"
 
 
 class OrderItem(models.Model):
+    """
+    Позиция заказа. Название, категория, изображение и артикул товара
+    копируются при оформлении: история заказов читается без JOIN с
+    каталогом и не пропадает при удалении товара.
+    """
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL)
+    # Отдельного артикула в каталоге нет – сохраняем id товара
+    sku = models.CharField(max_length=50, blank=True, verbose_name="Артикул")
+    product_name = models.CharField(max_length=200, blank=True, verbose_name="Товар")
+    category_name = models.CharField(max_length=100, blank=True, verbose_name="Категория")
+    product_image = models.ImageField(upload_to="products/", blank=True, verbose_name="Изображение")
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Цена на момент заказа
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name}"
+        return f"{self.quantity} x {self.product_name}"
+
+    @classmethod
+    def for_product(cls, product, **kwargs):
+        """Позиция с копией данных товара (product.category должен быть загружен)."""
+        return cls(
+            product=product,
+            sku=str(product.pk),
+            product_name=product.name,
+            category_name=product.category.name,
+            product_image=product.image.name if product.image else "",
+            **kwargs,
+        )
 
     def get_total_price(self):
         return self.price * self.quantity
@@ -227,4 +450,197 @@ class FooterLink(models.Model):
         verbose_name_plural = "Посилання футера"
 
     def __str__(self):
-        return f"{self.section.title} -> {self.title}"
\ No newline at end of file
+        return f"{self.section.title} -> {self.title}"
+
+class FacetCount(models.Model):
+    """
+    Предрасчитанное количество товаров корневой категории по значению фасета.
+    Поддерживается инкрементально сигналами Product (см. store.facets).
+    """
+    FACET_CHOICES = [
+        ("brand", "Бренд"),
+        ("price", "Ценовой диапазон"),
+        ("in_stock", "В наличии"),
+        ("on_sale", "Со скидкой"),
+    ]
+
+    category = models.ForeignKey(
+        Category,
+        related_name="facet_counts",
+        on_delete=models.CASCADE,
+        verbose_name="Корневая категория",
+    )
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES, verbose_name="Фасет")
+    value = models.CharField(max_length=50, verbose_name="Значение")
+    count = models.IntegerField(default=0, verbose_name="Количество товаров")
+
+    class Meta:
+        unique_together = ("category", "facet", "value")
+        verbose_name = "Счётчик фасета"
+        verbose_name_plural = "Счётчики фасетов"
+
+    def __str__(self):
+        return f"{self.category_id}:{self.facet}={self.value} ({self.count})"
+
+
+class StockReservation(models.Model):
+    """
+    Временный резерв товара под корзину покупателя (см. store.reservations).
+    holder – "user:<id>" или "guest:<токен из сессии>".
+    """
+    product = models.ForeignKey(
+        Product,
+        related_name="reservations",
+        on_delete=models.CASCADE,
+        verbose_name="Товар",
+    )
+    holder = models.CharField(max_length=64, verbose_name="Покупатель")
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("holder", "product")
+        indexes = [
+            # SUM(quantity) активных резервов товара
+            models.Index(fields=["product", "expires_at"], name="reservation_product_idx"),
+            # Удаление просроченных
+            models.Index(fields=["expires_at"], name="reservation_expires_idx"),
+        ]
+        verbose_name = "Резерв товара"
+        verbose_name_plural = "Резервы товаров"
+
+    def __str__(self):
+        return f"{self.holder}: {self.quantity} x {self.product_id}"
+
+
+class StockMovement(models.Model):
+    """
+    Запись журнала остатков (только добавление, см. store.inventory).
+    applied=True – изменение уже учтено в Product.stock.
+    """
+    REASON_CHOICES = [
+        ("initial", "Начальный остаток"),
+        ("manual", "Правка остатка"),
+        ("order", "Заказ"),
+        ("correction", "Сверка"),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        related_name="stock_movements",
+        on_delete=models.CASCADE,
+        verbose_name="Товар",
+    )
+    delta = models.IntegerField(verbose_name="Изменение")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, verbose_name="Причина")
+    order = models.ForeignKey(
+        Order,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Заказ",
+    )
+    applied = models.BooleanField(default=False, verbose_name="Учтено в остатке")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+
+    class Meta:
+        indexes = [
+            # Несвёрнутые записи товара – их немного, индекс маленький
+            models.Index(
+                fields=["product"],
+                condition=models.Q(applied=False),
+                name="stockmovement_pending_idx",
+            ),
+        ]
+        verbose_name = "Движение остатка"
+        verbose_name_plural = "Движения остатков"
+
+    def __str__(self):
+        return f"{self.product_id}: {self.delta:+d} ({self.reason})"
+
+
+class Task(models.Model):
+    """
+    Фоновая задача в очереди (см. store.tasks): путь к функции и её аргументы.
+    Выполняется командой run_worker вне HTTP-запроса.
+    """
+    STATUS_CHOICES = [
+        ("queued", "В очереди"),
+        ("running", "Выполняется"),
+        ("done", "Выполнена"),
+        ("failed", "Ошибка"),
+    ]
+
+    name = models.CharField(max_length=200, verbose_name="Функция")
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name="Аргументы")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued", verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name="Максимум попыток")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Запустить после")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        indexes = [
+            # Выборка готовых задач воркером
+            models.Index(fields=["run_at"], condition=models.Q(status="queued"), name="task_ready_idx"),
+            # Задачи упавших воркеров
+            models.Index(fields=["locked_at"], condition=models.Q(status="running"), name="task_running_idx"),
+        ]
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class SearchEvent(models.Model):
+    """
+    Поисковый запрос покупателя (см. store.analytics): пишется пачками
+    из буфера воркера, сводку строит команда rollup_search_events.
+    """
+    SOURCE_CHOICES = [
+        ("suggest", "Автодополнение"),
+        ("catalog", "Каталог"),
+    ]
+
+    query = models.CharField(max_length=200, verbose_name="Запрос")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, verbose_name="Источник")
+    results = models.PositiveIntegerField(verbose_name="Найдено")
+    duration_ms = models.FloatField(verbose_name="Время ответа, мс")
+    # Время события, а не записи пачки
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Время")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="searchevent_created_idx"),
+        ]
+        verbose_name = "Поисковый запрос"
+        verbose_name_plural = "Поисковые запросы"
+
+    def __str__(self):
+        return f"{self.query} ({self.results})"
+
+
+class ProductViewHour(models.Model):
+    """Просмотры товара за час (см. store.analytics) – для трендов и популярности."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+", verbose_name="Товар")
+    hour = models.DateTimeField(verbose_name="Час")
+    views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+
+    class Meta:
+        unique_together = ("product", "hour")
+        indexes = [
+            # Просмотры за последние N часов по всем товарам
+            models.Index(fields=["hour"], name="productviewhour_hour_idx"),
+        ]
+        verbose_name = "Просмотры за час"
+        verbose_name_plural = "Просмотры по часам"
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.hour:%Y-%m-%d %H:00}: {self.views}"
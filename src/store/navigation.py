@@ -0,0 +1,90 @@
+"""
+Дерево навигации по категориям (корни и их прямые подкатегории).
+
+Дерево строится одним запросом с prefetch, кладётся в общий кэш под
+текущей версией и запоминается в памяти процесса. Версия меняется при
+сохранении/удалении Category (см. store.signals), после чего каждый
+процесс один раз перечитывает дерево. В обычном запросе стоимость –
+один cache.get версии, без запросов к БД.
+
+Это же дерево используется для разбора ?category=/&subcategory= по slug.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import Category
+
+
+VERSION_KEY = "navigation:version"
+TREE_KEY = "navigation:tree:{}"
+TREE_TIMEOUT = 60 * 60 * 24
+
+# (версия, дерево) последнего прочитанного дерева в этом процессе
+_memo = (None, None)
+
+
+class NavigationTree:
+    """Корневые категории с подкатегориями и индексы по slug."""
+
+    def __init__(self, roots):
+        self.roots = roots
+        self._roots_by_slug = {root.slug: root for root in roots}
+        self._children_by_slug = {
+            root.pk: {child.slug: child for child in root.subcategories.all()}
+            for root in roots
+        }
+
+    def __getstate__(self):
+        return {"roots": self.roots}
+
+    def __setstate__(self, state):
+        self.__init__(state["roots"])
+
+    def get_root(self, slug):
+        return self._roots_by_slug.get(slug)
+
+    def get_child(self, root, slug):
+        return self._children_by_slug.get(root.pk, {}).get(slug)
+
+
+def build_navigation():
+    roots = list(
+        Category.objects.filter(parent__isnull=True)
+        .prefetch_related("subcategories")
+        .order_by("pk")
+    )
+    return NavigationTree(roots)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_navigation(request=None):
+    """Текущее дерево навигации; в пределах запроса читается один раз."""
+    global _memo
+    if request is not None and hasattr(request, "_navigation"):
+        return request._navigation
+
+    version = _current_version()
+    memo_version, tree = _memo
+    if memo_version != version or tree is None:
+        key = TREE_KEY.format(version)
+        tree = cache.get(key)
+        if tree is None:
+            tree = build_navigation()
+            cache.set(key, tree, TREE_TIMEOUT)
+        _memo = (version, tree)
+
+    if request is not None:
+        request._navigation = tree
+    return tree
+
+
+def bump_navigation_version():
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
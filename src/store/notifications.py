@@ -0,0 +1,23 @@
+"""
+Письма покупателям. Отправляются фоновыми задачами (store.tasks), поэтому
+SMTP не входит во время ответа админки или магазина.
+"""
+from django.core.mail import send_mail
+
+from .models import Order
+
+
+def send_order_status_email(order_id, status):
+    """Письмо о смене статуса заказа на status."""
+    order = Order.objects.select_related("user").filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    status_display = dict(Order.STATUS_CHOICES).get(status, status)
+    send_mail(
+        f"Заказ #{order.pk}: {status_display}",
+        f"Здравствуйте, {order.user.get_full_name() or order.user.username}!\n\n"
+        f"Статус вашего заказа #{order.pk} изменён: {status_display}.\n"
+        f"Сумма заказа: {order.total_price} грн.\n",
+        None,
+        [order.user.email],
+    )
@@ -0,0 +1,219 @@
+"""
+Кэш целых страниц каталога для анонимных посетителей.
+
+Ключ страницы строится из нормализованных GET-параметров: неизвестные
+отбрасываются, значения приводятся к каноническому виду (сортировка по
+умолчанию удаляется, цены – как Decimal без лишних нулей), порядок
+параметров фиксирован. View получает уже нормализованный request.GET,
+поэтому всё, что он выводит, зависит только от ключа.
+
+Инвалидация – через поколения в кэше (см. store.signals):
+- "site"     – категории и футер, входят в ключ каждой страницы;
+- "catalog"  – любое изменение товара, для страниц без выбранной категории;
+- "cat:<id>" – изменение товара корневой категории <id>.
+Старые страницы не удаляются, а перестают читаться и вытесняются по таймауту.
+
+CSRF: токен в сохранённой странице заменяется заглушкой, а при отдаче
+подставляется токен текущего посетителя, так что формы продолжают работать.
+"""
+import hashlib
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict
+from django.middleware.csrf import get_token
+
+from . import guestcart
+from .analytics import RESULTS_HEADER
+from .facets import PRICE_BUCKETS
+from .models import Product
+from .navigation import get_navigation
+from .pagination import DEFAULT_SORT, SEARCH_SORT, resolve_sort
+
+
+# Параметры выдачи каталога (index, product_list)
+CATALOG_PARAMS = (
+    "q",
+    "category",
+    "subcategory",
+    "sort",
+    "min_price",
+    "max_price",
+    "price_bucket",
+    "in_stock",
+    "on_sale",
+    "cursor",
+)
+
+GENERATION_KEY = "page-gen:{}"
+PRODUCT_ROOT_KEY = "page-product-root:{}"
+# Заголовки ответа, которые кэшируются вместе со страницей
+CACHED_HEADERS = (RESULTS_HEADER,)
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+
+def _canonical_price(value):
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        return ""
+    if not price.is_finite():
+        return ""
+    return f"{price.normalize():f}"
+
+
+def _canonical(name, value, searching=False):
+    if name == "sort":
+        sort = resolve_sort(value, searching)
+        return "" if sort == (SEARCH_SORT if searching else DEFAULT_SORT) else sort
+    if name in ("min_price", "max_price"):
+        return _canonical_price(value)
+    if name in ("in_stock", "on_sale"):
+        return "1" if value == "1" else ""
+    if name == "price_bucket":
+        return value if any(key == value for key, _, _, _ in PRICE_BUCKETS) else ""
+    return value
+
+
+def normalize_params(query, allowed):
+    """QueryDict только из разрешённых параметров в каноническом виде и порядке."""
+    params = QueryDict(mutable=True)
+    searching = bool(query.get("q", "").strip())
+    for name in sorted(allowed):
+        value = _canonical(name, query.get(name, "").strip(), searching)
+        if value:
+            params[name] = value
+    return params
+
+
+def _new_generation():
+    return time.time_ns()
+
+
+def generations(*scopes):
+    """Текущие поколения указанных областей одним get_many."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in values}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        values.update(missing)
+    return [values[key] for key in keys]
+
+
+def bump_generations(*scopes):
+    """Сбрасывает закэшированные страницы указанных областей."""
+    generation = _new_generation()
+    cache.set_many(
+        {GENERATION_KEY.format(scope): generation for scope in scopes}, timeout=None
+    )
+
+
+def bump_product_generations(*root_ids):
+    """Товар изменился: страницы всего каталога и его корневых категорий."""
+    bump_generations("catalog", *(f"cat:{root_id}" for root_id in root_ids if root_id))
+
+
+def catalog_scope(request, **kwargs):
+    """Область выдачи: выбранная корневая категория или весь каталог."""
+    slug = request.GET.get("category")
+    if not slug:
+        return "catalog"
+    root = get_navigation(request).get_root(slug)
+    # Несуществующая категория – view ответит 404, такой ответ не кэшируется
+    return f"cat:{root.pk}" if root else "catalog"
+
+
+def product_scope(request, product_id, **kwargs):
+    """
+    Страница товара зависит от товаров его корневой категории. Корень товара
+    берётся из кэша, чтобы ответ из кэша страниц обходился без запросов к БД;
+    перенос товара сбрасывает его (forget_product_roots), а таймаут
+    ограничивает устаревание, если запрос успел записать старый корень.
+    """
+    key = PRODUCT_ROOT_KEY.format(product_id)
+    root_id = cache.get(key)
+    if root_id is None:
+        roots = Product.objects.filter(pk=product_id).values_list("root_category_id", flat=True)
+        if not roots:
+            # Несуществующий товар – view ответит 404, такой ответ не кэшируется
+            return "catalog"
+        root_id = roots[0] or 0
+        cache.set(key, root_id, getattr(settings, "PAGE_CACHE_TIMEOUT", 300))
+    return f"cat:{root_id}" if root_id else "catalog"
+
+
+def forget_product_roots(product_ids):
+    """Товары сменили корневую категорию."""
+    cache.delete_many([PRODUCT_ROOT_KEY.format(pk) for pk in product_ids])
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        # Сообщения и бейдж гостевой корзины выводятся в base.html –
+        # такие страницы не кэшируем
+        and not len(get_messages(request))
+        and not guestcart.has_items(request)
+    )
+
+
+def _cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and response.get("Content-Type", "").startswith("text/html")
+    )
+
+
+def _with_csrf(request, content):
+    return content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+
+
+def cache_anonymous_page(params=(), scope=lambda request, **kwargs: "catalog"):
+    """
+    Декоратор view: кэширует HTML для анонимных посетителей.
+    params – учитываемые GET-параметры, scope(request, **kwargs) – область инвалидации.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            request.GET = normalize_params(request.GET, params)
+            request.META["QUERY_STRING"] = request.GET.urlencode()
+
+            site, scope_generation = generations("site", scope(request, **kwargs))
+            path = ":".join(str(value) for value in (view.__name__, *args, *kwargs.values()))
+            digest = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+            key = f"page:{path}:{site}:{scope_generation}:{digest}"
+
+            cached = cache.get(key)
+            if cached is not None:
+                content_type, content, *headers = cached
+                response = HttpResponse(_with_csrf(request, content), content_type=content_type)
+                for name, value in (headers[0] if headers else {}).items():
+                    response[name] = value
+                return response
+
+            response = view(request, *args, **kwargs)
+            if _cacheable_response(response):
+                content = CSRF_INPUT.sub(rf"\g<1>{CSRF_PLACEHOLDER}\g<2>", response.content.decode())
+                headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+                cache.set(
+                    key,
+                    (response["Content-Type"], content.encode(), headers),
+                    getattr(settings, "PAGE_CACHE_TIMEOUT", 300),
+                )
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,189 @@
+"""
+Keyset (cursor) пагинация каталога.
+
+Вместо OFFSET страница выбирается условием по ключу сортировки
+последнего показанного товара, поэтому глубокие страницы стоят столько же,
+сколько первая. Каждой сортировке соответствует пара полей: основное поле
+и ``id`` как стабильный tie-breaker.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+
+
+DEFAULT_SORT = "popular"
+# Сортировка по умолчанию для поиска; без запроса недоступна
+SEARCH_SORT = "relevance"
+
+# sort -> (поле, tie-breaker); "-" означает сортировку по убыванию
+SORT_KEYS = {
+    "price_asc": ("effective_price", "id"),
+    "price_desc": ("-effective_price", "-id"),
+    "new": ("-created_at", "-id"),
+    "popular": ("-popularity", "-id"),
+    # search_rank – аннотация store.search.rank_products
+    "relevance": ("-search_rank", "-id"),
+}
+
+# Поля ключа, которых нет в модели (аннотации)
+ANNOTATED_FIELDS = {"search_rank": models.FloatField()}
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или выпущен для другой сортировки."""
+
+
+def normalize_sort(sort):
+    return sort if sort in SORT_KEYS else DEFAULT_SORT
+
+
+def resolve_sort(sort, searching=False):
+    """Сортировка выдачи: при поиске по умолчанию – релевантность, без поиска её нет."""
+    if searching and sort not in SORT_KEYS:
+        return SEARCH_SORT
+    sort = normalize_sort(sort)
+    return DEFAULT_SORT if sort == SEARCH_SORT and not searching else sort
+
+
+def order_by_sort(qs, sort):
+    """Сортирует queryset по ключу sort с tie-breaker по id."""
+    return qs.order_by(*SORT_KEYS[normalize_sort(sort)])
+
+
+def encode_cursor(sort, values, direction):
+    payload = {"s": sort, "k": values, "d": direction}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort, values, direction = payload["s"], payload["k"], payload["d"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return sort, values, direction
+
+
+def _field_names(ordering):
+    return [name.lstrip("-") for name in ordering]
+
+
+def _cursor_values(obj, ordering):
+    """Значения ключа сортировки объекта в JSON-совместимом виде."""
+    values = []
+    for name in _field_names(ordering):
+        value = getattr(obj, name)
+        values.append(value.isoformat() if hasattr(value, "isoformat") else str(value))
+    return values
+
+
+def _key_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return ANNOTATED_FIELDS[name]
+
+
+def _parse_values(model, ordering, raw_values):
+    names = _field_names(ordering)
+    # encode_cursor пишет только строки: null, списки и объекты из
+    # подделанного курсора to_python пропустил бы или уронил бы TypeError
+    if len(raw_values) != len(names) or not all(isinstance(raw, str) for raw in raw_values):
+        raise InvalidCursor(raw_values)
+    try:
+        return [
+            _key_field(model, name).to_python(raw)
+            for name, raw in zip(names, raw_values)
+        ]
+    except (ValidationError, TypeError, ValueError):
+        raise InvalidCursor(raw_values)
+
+
+def _seek_filter(ordering, values, after=True):
+    """
+    Условие «строго после» (или «строго до») ключа values для ordering.
+
+    Для (a, id) по возрастанию: a > v OR (a = v AND id > v_id).
+    """
+    condition = models.Q()
+    for i, name in enumerate(ordering):
+        field = name.lstrip("-")
+        descending = name.startswith("-")
+        lookup = "lt" if descending == after else "gt"
+        step = models.Q(**{f"{field}__{lookup}": values[i]})
+        for prev_name, prev_value in zip(ordering[:i], values[:i]):
+            step &= models.Q(**{prev_name.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+def _reverse(ordering):
+    return tuple(name[1:] if name.startswith("-") else f"-{name}" for name in ordering)
+
+
+class KeysetPage:
+    """Страница выдачи с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, sort, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.sort = sort
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = None
+        self.prev_cursor = None
+        if object_list and has_next:
+            self.next_cursor = encode_cursor(sort, _cursor_values(object_list[-1], ordering), "next")
+        if object_list and has_previous:
+            self.prev_cursor = encode_cursor(sort, _cursor_values(object_list[0], ordering), "prev")
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def paginate_keyset(qs, sort, cursor=None, per_page=24):
+    """
+    Возвращает KeysetPage для queryset qs.
+
+    Некорректный курсор или курсор от другой сортировки даёт первую страницу.
+    """
+    sort = normalize_sort(sort)
+    ordering = SORT_KEYS[sort]
+    direction = "next"
+    values = None
+
+    if cursor:
+        try:
+            cursor_sort, raw_values, direction = decode_cursor(cursor)
+            if cursor_sort != sort:
+                raise InvalidCursor(cursor)
+            values = _parse_values(qs.model, ordering, raw_values)
+        except InvalidCursor:
+            direction, values = "next", None
+
+    if values is None:
+        rows = list(qs.order_by(*ordering)[: per_page + 1])
+        return KeysetPage(rows[:per_page], sort, ordering, len(rows) > per_page, False)
+
+    if direction == "next":
+        rows = list(qs.filter(_seek_filter(ordering, values)).order_by(*ordering)[: per_page + 1])
+        return KeysetPage(rows[:per_page], sort, ordering, len(rows) > per_page, True)
+
+    rows = list(
+        qs.filter(_seek_filter(ordering, values, after=False))
+        .order_by(*_reverse(ordering))[: per_page + 1]
+    )
+    page = rows[:per_page]
+    page.reverse()
+    return KeysetPage(page, sort, ordering, True, len(rows) > per_page)
@@ -0,0 +1,74 @@
+"""
+Рейтинг популярности товаров по продажам с затуханием во времени.
+
+Вклад продажи qty в момент t равен qty * 2 ** ((t - EPOCH) / HALF_LIFE).
+Это тот же экспоненциальный спад с периодом полураспада HALF_LIFE, только
+умноженный на общий для всех товаров множитель. Поэтому порядок товаров
+по Product.popularity совпадает с порядком по «текущему» затухшему рейтингу,
+а новую продажу можно просто прибавить к колонке без пересчёта остальных.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.db import models, transaction
+from django.utils import timezone as dj_timezone
+
+from . import suggestions
+from .models import OrderItem, Product
+
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+HALF_LIFE = timedelta(days=30)
+
+
+def sale_weight(when=None):
+    """Вес одной проданной единицы в момент when."""
+    when = when or dj_timezone.now()
+    return 2 ** ((when - EPOCH) / HALF_LIFE)
+
+
+def record_sales(items, when=None):
+    """
+    Инкрементально прибавляет продажи к рейтингу.
+    items – пары (product_id, quantity).
+    """
+    weight = sale_weight(when)
+    totals = {}
+    for product_id, quantity in items:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    if not totals:
+        return
+    # Один UPDATE на весь заказ
+    increment = models.Case(
+        *(models.When(pk=pk, then=models.Value(quantity * weight)) for pk, quantity in totals.items()),
+        output_field=models.FloatField(),
+    )
+    Product.objects.filter(pk__in=totals).update(popularity=models.F("popularity") + increment)
+    suggestions.mark_changed(totals)
+
+
+def record_sales_on_commit(items, when=None):
+    """Учитывает продажи только если текущая транзакция (оформление заказа) зафиксирована."""
+    items = list(items)
+    transaction.on_commit(lambda: record_sales(items, when))
+
+
+def recompute_popularity(since=None, batch_size=500):
+    """
+    Полный пересчёт рейтинга по истории заказов (кроме отменённых).
+    since – учитывать только заказы не старше этой даты.
+    """
+    order_items = OrderItem.objects.exclude(order__status="cancelled").filter(product__isnull=False)
+    if since is not None:
+        order_items = order_items.filter(order__created_at__gte=since)
+
+    scores = {}
+    rows = order_items.values_list("product_id", "quantity", "order__created_at")
+    for product_id, quantity, created_at in rows.iterator():
+        scores[product_id] = scores.get(product_id, 0.0) + quantity * sale_weight(created_at)
+
+    with transaction.atomic():
+        Product.objects.exclude(popularity=0).update(popularity=0)
+        products = [Product(pk=pk, popularity=score) for pk, score in scores.items()]
+        Product.objects.bulk_update(products, ["popularity"], batch_size=batch_size)
+        suggestions.mark_all_changed()
+    return len(scores)
@@ -0,0 +1,79 @@
+"""
+Расчёт цен корзины: строки, скидки и итоги.
+
+Цена единицы – Product.effective_price (с учётом акции), «без скидки» –
+Product.price. Суммы строк считаются в БД выражениями ниже, поэтому
+корзина, оформление заказа и админка показывают и списывают одно и то же:
+- price_cart(cart)      – позиции одной корзины с суммами, один запрос;
+- with_totals(carts)    – итоги для любого числа корзин одним агрегатом;
+- CartPricing           – итоги по уже посчитанным позициям (и гостевой корзине).
+"""
+from decimal import Decimal
+
+from django.db import models
+from django.db.models.functions import Coalesce
+
+
+MONEY = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def line_total_expression(prefix=""):
+    """quantity * effective_price для CartItem (prefix – путь к CartItem, напр. "items__")."""
+    return models.ExpressionWrapper(
+        models.F(f"{prefix}quantity") * models.F(f"{prefix}product__effective_price"),
+        output_field=MONEY,
+    )
+
+
+def line_discount_expression(prefix=""):
+    return models.ExpressionWrapper(
+        models.F(f"{prefix}quantity")
+        * (models.F(f"{prefix}product__price") - models.F(f"{prefix}product__effective_price")),
+        output_field=MONEY,
+    )
+
+
+def price_items(items):
+    """Аннотирует queryset CartItem ценой единицы и суммами строки."""
+    return items.annotate(
+        unit_price=models.F("product__effective_price"),
+        list_price=models.F("product__price"),
+        line_total=line_total_expression(),
+        line_discount=line_discount_expression(),
+    )
+
+
+def with_totals(carts):
+    """Аннотирует queryset Cart итогами: items_count, subtotal, discount, total."""
+    zero = models.Value(Decimal("0"), output_field=MONEY)
+    return carts.annotate(
+        items_count=Coalesce(models.Sum("items__quantity"), 0),
+        total=Coalesce(models.Sum(line_total_expression("items__")), zero),
+        discount=Coalesce(models.Sum(line_discount_expression("items__")), zero),
+    ).annotate(
+        subtotal=models.ExpressionWrapper(
+            models.F("total") + models.F("discount"), output_field=MONEY
+        ),
+    )
+
+
+class CartPricing:
+    """Позиции корзины с посчитанными суммами и итоги по ним."""
+
+    def __init__(self, items):
+        self.items = items
+        self.total_items = sum(item.quantity for item in items)
+        self.total = sum((item.line_total for item in items), Decimal("0"))
+        self.discount = sum((item.line_discount for item in items), Decimal("0"))
+        self.subtotal = self.total + self.discount
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def price_cart(cart):
+    """CartPricing корзины: один запрос на позиции вместе с товарами и суммами."""
+    if cart.pk is None:
+        return CartPricing([])
+    items = price_items(cart.items.select_related("product__category")).order_by("pk")
+    return CartPricing(list(items))
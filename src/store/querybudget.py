@@ -0,0 +1,196 @@
+"""
+Учёт SQL-запросов на запрос: бюджет по view и поиск N+1.
+
+QueryBudgetMiddleware записывает каждый запрос через connection.execute_wrapper,
+группирует их по «форме» (SQL без параметров, IN (...) свёрнут) и запоминает,
+откуда они пришли: строку шаблона или первый кадр стека в коде проекта.
+Обход стека дорогой, поэтому в продакшене источник ищется только у формы,
+которая уже повторилась QUERY_BUDGET_NPLUSONE_THRESHOLD раз (по выборке из
+стольких же следующих повторов); для каждого запроса – при DEBUG,
+QUERY_BUDGET_RAISE и в query_budget().
+
+Настройки:
+- QUERY_BUDGET_DEFAULT – сколько запросов можно view по умолчанию (None – без лимита);
+- QUERY_BUDGETS – {"url name" или "module.view": лимит};
+- QUERY_BUDGET_NPLUSONE_THRESHOLD – сколько повторов одной формы считать N+1;
+- QUERY_BUDGET_RAISE – бросать QueryBudgetExceeded вместо записи в лог (для тестов).
+
+Не считается управление транзакциями (BEGIN, SAVEPOINT, COMMIT...):
+драйвер Postgres его сюда не передаёт вовсе, а у SQLite его добавляет
+каждый atomic(). Запросы DatabaseCache, если он настроен, считаются –
+каждое обращение к такому кэшу стоит запроса к БД.
+
+В тестах удобно использовать query_budget():
+
+    with query_budget(10):
+        client.get("/products/")
+"""
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+TRANSACTION = re.compile(r"\s*(?:BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос превысил бюджет SQL-запросов или содержит N+1."""
+
+
+def statement_shape(sql):
+    """Форма запроса: параметры уже вынесены драйвером, сворачиваем только IN-списки."""
+    return IN_LIST.sub("IN (...)", sql)
+
+
+def query_origin():
+    """Строка шаблона ('store/product_list.html:42') или кадр кода проекта."""
+    frame = sys._getframe(1)
+    code_origin = None
+    while frame is not None:
+        if frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                return f"{origin.template_name}:{token.lineno}"
+        filename = frame.f_code.co_filename
+        if (
+            code_origin is None
+            and filename.startswith(PROJECT_DIR)
+            and filename != __file__
+            and "site-packages" not in filename
+        ):
+            code_origin = f"{Path(filename).relative_to(PROJECT_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return code_origin or "?"
+
+
+class StatementGroup:
+    __slots__ = ("shape", "count", "duration", "origins")
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.count = 0
+        self.duration = 0.0
+        self.origins = Counter()
+
+    @property
+    def origin(self):
+        return self.origins.most_common(1)[0][0] if self.origins else "?"
+
+
+class QueryRecorder:
+    """execute_wrapper, собирающий статистику по формам запросов."""
+
+    def __init__(self, nplusone_threshold=None, trace=None):
+        if nplusone_threshold is None:
+            nplusone_threshold = getattr(settings, "QUERY_BUDGET_NPLUSONE_THRESHOLD", 5)
+        if trace is None:
+            trace = settings.DEBUG or getattr(settings, "QUERY_BUDGET_RAISE", False)
+        self.groups = {}
+        self.total = 0
+        self.threshold = nplusone_threshold
+        self.trace = trace
+
+    def __call__(self, execute, sql, params, many, context):
+        if TRANSACTION.match(sql):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            shape = statement_shape(sql)
+            group = self.groups.get(shape)
+            if group is None:
+                group = self.groups[shape] = StatementGroup(shape)
+            group.count += 1
+            group.duration += time.perf_counter() - start
+            if self.trace or self.threshold <= group.count < 2 * self.threshold:
+                group.origins[query_origin()] += 1
+            self.total += 1
+
+    @contextmanager
+    def record(self, using=None):
+        aliases = [using] if using else list(connections)
+        with _wrap_connections(self, aliases):
+            yield self
+
+    def repeated(self, threshold):
+        """Группы, похожие на N+1: одна форма выполнена threshold и более раз."""
+        return sorted(
+            (group for group in self.groups.values() if group.count >= threshold),
+            key=lambda group: -group.count,
+        )
+
+    def problems(self, budget=None, nplusone_threshold=None):
+        if nplusone_threshold is None:
+            nplusone_threshold = self.threshold
+        problems = []
+        if budget is not None and self.total > budget:
+            problems.append(f"{self.total} queries (budget {budget})")
+        for group in self.repeated(nplusone_threshold):
+            problems.append(f"N+1: {group.count}x from {group.origin}: {group.shape[:200]}")
+        return problems
+
+
+@contextmanager
+def _wrap_connections(wrapper, aliases):
+    if not aliases:
+        yield
+        return
+    with connections[aliases[0]].execute_wrapper(wrapper):
+        with _wrap_connections(wrapper, aliases[1:]):
+            yield
+
+
+def budget_for(request):
+    """Лимит для view запроса: по имени URL, затем по пути к функции."""
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    match = getattr(request, "resolver_match", None)
+    if match is not None:
+        func_path = f"{match.func.__module__}.{getattr(match.func, '__name__', '')}"
+        for key in (match.url_name, match.view_name, func_path):
+            if key in budgets:
+                return budgets[key]
+    return getattr(settings, "QUERY_BUDGET_DEFAULT", None)
+
+
+@contextmanager
+def query_budget(max_queries=None, nplusone_threshold=None):
+    """Тестовый помощник: бросает QueryBudgetExceeded при превышении или N+1."""
+    recorder = QueryRecorder(nplusone_threshold, trace=True)
+    with recorder.record():
+        yield recorder
+    problems = recorder.problems(max_queries, nplusone_threshold)
+    if problems:
+        raise QueryBudgetExceeded("\n".join(problems))
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+
+        problems = recorder.problems(budget_for(request))
+        if problems:
+            view = getattr(getattr(request, "resolver_match", None), "view_name", request.path)
+            message = f"{view}: " + "; ".join(problems)
+            if getattr(settings, "QUERY_BUDGET_RAISE", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
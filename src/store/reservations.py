@@ -0,0 +1,154 @@
+"""
+Временные резервы товара под корзину.
+
+Добавление в корзину ставит резерв покупателя на всё количество товара в
+его корзине на STOCK_RESERVATION_TTL секунд; каждое изменение корзины
+продлевает его. Оформление заказа списывает остаток и снимает резервы,
+просроченные строки удаляет команда sweep_reservations.
+
+Доступно к продаже = точный остаток (store.inventory) - активные резервы
+других покупателей: один SUM по индексу (product, expires_at). Во время
+распродаж покупатели пишут каждый свою строку StockReservation, строка
+Product при этом не обновляется.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .inventory import stock_expression
+from .models import Product, StockReservation
+
+
+HOLDER_SESSION_KEY = "reservation_holder"
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 15 * 60))
+
+
+def user_holder(user):
+    return f"user:{user.pk}"
+
+
+def session_holder(request):
+    """Владелец резервов гостя; токен хранится в сессии и переживает вход."""
+    token = request.session.get(HOLDER_SESSION_KEY)
+    if token is None:
+        token = request.session[HOLDER_SESSION_KEY] = secrets.token_urlsafe(16)
+    return f"guest:{token}"
+
+
+def holder_for(request):
+    if request.user.is_authenticated:
+        return user_holder(request.user)
+    return session_holder(request)
+
+
+def held_expression(exclude_holder=None, now=None):
+    """Сумма активных резервов товара OuterRef("pk") (кроме exclude_holder)."""
+    holds = StockReservation.objects.filter(
+        product=models.OuterRef("pk"),
+        expires_at__gt=now or timezone.now(),
+    )
+    if exclude_holder is not None:
+        holds = holds.exclude(holder=exclude_holder)
+    holds = holds.order_by().values("product").annotate(s=models.Sum("quantity")).values("s")
+    return Coalesce(models.Subquery(holds), 0)
+
+
+def with_available(products, holder=None, now=None):
+    """Аннотирует queryset Product полем available – сколько может купить holder."""
+    return products.annotate(
+        available=models.ExpressionWrapper(
+            stock_expression() - held_expression(holder, now),
+            output_field=models.IntegerField(),
+        )
+    )
+
+
+def available_to_sell(product_id, holder=None):
+    available = (
+        with_available(Product.objects.filter(pk=product_id), holder)
+        .values_list("available", flat=True)
+        .first()
+    )
+    return max(available or 0, 0)
+
+
+def reserve(holder, product_id, quantity):
+    """
+    Ставит резерв holder на quantity единиц товара (заменяя прежний).
+    Возвращает False и ничего не меняет, если столько товара нет.
+    """
+    if quantity <= 0:
+        release(holder, [product_id])
+        return True
+    now = timezone.now()
+    with transaction.atomic():
+        StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    holder=holder,
+                    product_id=product_id,
+                    quantity=quantity,
+                    expires_at=now + reservation_ttl(),
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["holder", "product"],
+            update_fields=["quantity", "expires_at"],
+        )
+        # Проверка после записи: из двух одновременных резервов на последние
+        # единицы прошедший первым виден второму. Окончательно остаток всё
+        # равно проверяется под блокировкой при оформлении заказа.
+        available = (
+            with_available(Product.objects.filter(pk=product_id), now=now)
+            .values_list("available", flat=True)
+            .first()
+        )
+        if available is None or available < 0:
+            transaction.set_rollback(True)
+            return False
+    return True
+
+
+def hold(holder, quantities):
+    """Ставит резервы {product_id: quantity} без проверки (количества уже проверены)."""
+    expires_at = timezone.now() + reservation_ttl()
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(holder=holder, product_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in quantities.items()
+            if quantity > 0
+        ],
+        update_conflicts=True,
+        unique_fields=["holder", "product"],
+        update_fields=["quantity", "expires_at"],
+    )
+
+
+def release(holder, product_ids=None):
+    """Снимает резервы holder (все или по указанным товарам)."""
+    holds = StockReservation.objects.filter(holder=holder)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    holds.delete()
+
+
+def sweep_expired(batch_size=1000):
+    """Удаляет просроченные резервы пачками по batch_size. Возвращает число строк."""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += StockReservation.objects.filter(pk__in=ids).delete()[0]
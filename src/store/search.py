@@ -0,0 +1,191 @@
+"""
+Полнотекстовый поиск товаров.
+
+Индекс – отдельная таблица store_product_search с ключом по id товара:
+- SQLite: виртуальная таблица FTS5 (name, description, search_key),
+  ранжирование bm25;
+- PostgreSQL: tsvector (название – вес A, ключ поиска – B, описание – C)
+  с GIN-индексом, ранжирование ts_rank_cd.
+На других СУБД поиск остаётся icontains без ранжирования.
+
+Запрос разбивается на слова, каждое ищется как префикс и все слова
+обязательны: «смарт гал» находит «Смартфон Galaxy». Product.search_key
+хранит слова названия и категории в другой раскладке и транслитерации
+(store.transliteration), поэтому «самсунг» находит «Samsung». Индекс обновляется
+сигналами Product в той же транзакции (см. store.signals), команда
+rebuild_search_index перестраивает его целиком.
+
+Выражение релевантности ссылается на таблицу store_product напрямую,
+поэтому rank_products() применяется только к queryset верхнего уровня
+(выдача), а не к подзапросам.
+"""
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+from .transliteration import query_words, words
+
+
+SEARCH_TABLE = "store_product_search"
+PRODUCT_TABLE = Product._meta.db_table
+MAX_TERMS = 8
+
+def search_terms(query):
+    """Слова запроса в форме ключа поиска (для store.suggestions)."""
+    return words(query)[:MAX_TERMS]
+
+
+def match_terms(query):
+    """Слова запроса: кортежи написаний, подходит любое из них."""
+    terms = (tuple(spelling for spelling in spellings if spelling) for spellings in query_words(query))
+    return [spellings for spellings in terms if spellings][:MAX_TERMS]
+
+
+class SQLiteBackend:
+    def match(self, terms):
+        return " AND ".join(
+            "(" + " OR ".join(f'"{spelling}"*' for spelling in spellings) + ")"
+            for spellings in terms
+        )
+
+    def matching_ids(self):
+        return f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s"
+
+    def rank(self):
+        # bm25 меньше – релевантнее; веса: название, описание, ключ поиска.
+        # MATCH внутри коррелированного подзапроса выполнялся бы заново для
+        # каждого товара; MATERIALIZED CTE считается один раз за запрос,
+        # дальше – поиск по автоматическому индексу на rowid
+        return (
+            f"WITH ranked AS MATERIALIZED ("
+            f"SELECT rowid AS product_id, -bm25({SEARCH_TABLE}, 10.0, 1.0, 5.0) AS rank "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s) "
+            f"SELECT rank FROM ranked WHERE product_id = {PRODUCT_TABLE}.id"
+        )
+
+    def index(self, cursor, where, params):
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM {PRODUCT_TABLE} WHERE {where})",
+            params,
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, description, search_key) "
+            f"SELECT id, name, description, search_key FROM {PRODUCT_TABLE} WHERE {where}",
+            params,
+        )
+
+    def remove(self, cursor, ids):
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", ids)
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+class PostgresBackend:
+    DOCUMENT = (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', search_key), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    )
+
+    def match(self, terms):
+        return " & ".join(
+            "(" + " | ".join(f"{spelling}:*" for spelling in spellings) + ")"
+            for spellings in terms
+        )
+
+    def matching_ids(self):
+        return f"SELECT product_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)"
+
+    def rank(self):
+        # float8: значение ключа курсора должно совпадать при обратном сравнении
+        return (
+            f"SELECT ts_rank_cd(document, to_tsquery('simple', %s))::float8 FROM {SEARCH_TABLE} "
+            f"WHERE product_id = {PRODUCT_TABLE}.id"
+        )
+
+    def index(self, cursor, where, params):
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, document) "
+            f"SELECT id, {self.DOCUMENT} FROM {PRODUCT_TABLE} WHERE {where} "
+            f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            params,
+        )
+
+    def remove(self, cursor, ids):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [list(ids)])
+
+    def clear(self, cursor):
+        # DELETE, а не TRUNCATE: поиск продолжает работать по старому индексу до фиксации
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+_BACKENDS = {"sqlite": SQLiteBackend(), "postgresql": PostgresBackend()}
+
+
+def get_backend():
+    """Бэкенд полнотекстового индекса текущей БД или None (поиск через icontains)."""
+    return _BACKENDS.get(connection.vendor)
+
+
+def search_products(qs, query):
+    """Оставляет в queryset товары, подходящие под запрос."""
+    terms = match_terms(query)
+    if not terms:
+        return qs
+    backend = get_backend()
+    if backend is None:
+        for spellings in terms:
+            condition = models.Q()
+            for spelling in spellings:
+                condition |= (
+                    models.Q(name__icontains=spelling)
+                    | models.Q(description__icontains=spelling)
+                    | models.Q(search_key__icontains=spelling)
+                )
+            qs = qs.filter(condition)
+        return qs
+    return qs.filter(pk__in=RawSQL(backend.matching_ids(), [backend.match(terms)]))
+
+
+def rank_products(qs, query):
+    """Аннотирует выдачу поиска полем search_rank (больше – релевантнее)."""
+    terms = match_terms(query)
+    backend = get_backend()
+    if not terms or backend is None:
+        return qs.annotate(search_rank=models.Value(0.0, output_field=models.FloatField()))
+    return qs.annotate(
+        search_rank=RawSQL(backend.rank(), [backend.match(terms)], output_field=models.FloatField())
+    )
+
+
+def index_products(product_ids):
+    """Переиндексирует товары (после сохранения названия или описания)."""
+    backend = get_backend()
+    product_ids = list(product_ids)
+    if backend is None or not product_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    with connection.cursor() as cursor:
+        backend.index(cursor, f"id IN ({placeholders})", product_ids)
+
+
+def remove_products(product_ids):
+    backend = get_backend()
+    product_ids = list(product_ids)
+    if backend is None or not product_ids:
+        return
+    with connection.cursor() as cursor:
+        backend.remove(cursor, product_ids)
+
+
+def rebuild_index():
+    """Перестраивает индекс целиком двумя запросами. Возвращает число товаров."""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        backend.index(cursor, "1 = 1", [])
+    return Product.objects.count()
@@ -0,0 +1,210 @@
+"""
+Обработчики сигналов моделей магазина.
+Подключаются в StoreConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import facets, inventory, search, suggestions
+from .cards import bump_card_versions
+from .cartsummary import forget_cart_summaries
+from .models import Cart, CartItem, Category, FooterLink, FooterSection, Product, ProductImage
+from .navigation import bump_navigation_version
+from .pagecache import bump_generations, bump_product_generations, forget_product_roots
+from .transliteration import search_key
+
+
+# Поля товара в полнотекстовом индексе и в подсказках поиска
+SEARCH_FIELDS = {"name", "description", "search_key"}
+SUGGESTION_FIELDS = {"name", "search_key", "price", "sale_price", "effective_price", "popularity"}
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_facets(sender, instance, raw=False, **kwargs):
+    """Запоминаем фасеты товара до сохранения, чтобы применить разницу."""
+    if raw:
+        return
+    instance._facet_state = facets.stored_facet_state(instance.pk) if instance.pk else None
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_price(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Старая цена – чтобы пересчитать сводки корзин только при её изменении."""
+    if raw or not instance.pk or (
+        update_fields is not None and not {"price", "sale_price"} & set(update_fields)
+    ):
+        instance._stored_price = None
+        return
+    instance._stored_price = (
+        Product.objects.filter(pk=instance.pk).values_list("effective_price", flat=True).first()
+    )
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_stock(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Старый снимок остатка – правка попадёт в журнал (store.inventory)."""
+    if raw or (update_fields is not None and "stock" not in update_fields):
+        instance._stored_stock = None
+        return
+    instance._stored_stock = (
+        Product.objects.filter(pk=instance.pk).values_list("stock", flat=True).first() or 0
+        if instance.pk
+        else 0
+    )
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    facets.update_facet_counts(
+        getattr(instance, "_facet_state", None), facets.product_facet_state(instance)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_facets(sender, instance, **kwargs):
+    facets.update_facet_counts(
+        (instance.root_category_id, facets.facet_values(
+            instance.category.path, instance.price, instance.sale_price, instance.stock
+        )),
+        None,
+    )
+
+
+@receiver(post_save, sender=Product)
+def record_stock_edit(sender, instance, raw=False, created=False, **kwargs):
+    stored_stock = getattr(instance, "_stored_stock", None)
+    if raw or stored_stock is None or stored_stock == instance.stock:
+        return
+    inventory.record_edit(instance, instance.stock - stored_stock, created=created)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_suggestions(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not SUGGESTION_FIELDS & set(update_fields)):
+        return
+    suggestions.mark_changed([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_card(sender, instance, raw=False, **kwargs):
+    # Версия меняется после фиксации: иначе параллельный запрос успел бы
+    # закэшировать под новой версией карточку из незафиксированных данных
+    # (инлайны изображений админка пишет уже после сохранения товара).
+    # id берётся сразу – после delete() у instance его уже нет
+    if raw:
+        return
+    product_ids = [instance.pk]
+    transaction.on_commit(lambda: bump_card_versions(product_ids))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_card_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    product_ids = [instance.product_id]
+    transaction.on_commit(lambda: bump_card_versions(product_ids))
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category_cards(sender, instance, raw=False, created=False, **kwargs):
+    """Имя категории выводится в карточке – сбрасываем карточки её товаров."""
+    if raw or created:
+        return
+    product_ids = list(instance.products.values_list("pk", flat=True))
+    transaction.on_commit(lambda: bump_card_versions(product_ids))
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_keys(sender, instance, raw=False, created=False, **kwargs):
+    """Имя категории входит в ключ поиска её товаров."""
+    if raw or created:
+        return
+    changed = []
+    for product in instance.products.only("pk", "name", "search_key"):
+        key = search_key(product.name, instance.name)
+        if key != product.search_key:
+            product.search_key = key
+            changed.append(product)
+    if not changed:
+        return
+    # bulk_update не шлёт сигналов: индекс поиска и подсказки – здесь
+    Product.objects.bulk_update(changed, ["search_key"], batch_size=500)
+    product_ids = [product.pk for product in changed]
+    search.index_products(product_ids)
+    suggestions.mark_changed(product_ids)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Как и карточки – после фиксации, иначе анонимный запрос закэширует
+    # страницу из незафиксированных данных под новым поколением
+    old_root = (getattr(instance, "_facet_state", None) or (None,))[0]
+    new_root = instance.root_category_id
+    product_ids = [instance.pk]
+    transaction.on_commit(lambda: bump_product_generations(old_root, new_root))
+    if old_root is not None and old_root != new_root:
+        transaction.on_commit(lambda: forget_product_roots(product_ids))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=FooterSection)
+@receiver(post_delete, sender=FooterSection)
+@receiver(post_save, sender=FooterLink)
+@receiver(post_delete, sender=FooterLink)
+def invalidate_site_pages(sender, raw=False, **kwargs):
+    """Меню категорий и футер есть на каждой странице."""
+    if raw:
+        return
+    transaction.on_commit(lambda: bump_generations("site"))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_navigation(sender, raw=False, **kwargs):
+    # Category.save() дописывает path уже после post_save – ждём фиксации
+    if raw:
+        return
+    transaction.on_commit(bump_navigation_version)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def refresh_cart_summary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    carts = Cart.objects.filter(pk=instance.cart_id)
+    carts.refresh_summary()
+    forget_cart_summaries(carts.values_list("user_id", flat=True))
+
+
+@receiver(post_save, sender=Product)
+def refresh_carts_on_price_change(sender, instance, raw=False, **kwargs):
+    stored_price = getattr(instance, "_stored_price", None)
+    if raw or stored_price is None or stored_price == instance.effective_price:
+        return
+    carts = Cart.objects.filter(items__product=instance)
+    user_ids = list(carts.values_list("user_id", flat=True))
+    Cart.objects.filter(user_id__in=user_ids).refresh_summary()
+    forget_cart_summaries(user_ids)
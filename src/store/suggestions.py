@@ -0,0 +1,206 @@
+"""
+Автодополнение поиска (/api/search/) из индекса в памяти процесса.
+
+Индекс – префиксы слов ключа поиска Product.search_key (до MAX_PREFIX
+символов) -> id товаров, отсортированные по убыванию популярности. Ключ
+содержит слова названия и категории в обеих раскладках и транслитерации
+(store.transliteration), поэтому «самсунг» подсказывает «Samsung». Для
+подсказки берётся самый короткий список среди слов запроса и проходится
+до первых limit товаров, у которых каждое слово запроса – начало
+какого-нибудь слова ключа.
+Запросов к БД нет, только один cache.get версии.
+
+Индекс строится при старте воркера (config.wsgi) и обновляется по версии
+в общем кэше, как дерево навигации (store.navigation):
+- сохранение/удаление товара и продажи увеличивают версию и кладут
+  id изменённых товаров под ключ этой версии (mark_changed);
+- процесс, отставший на несколько версий, перечитывает только эти товары
+  одним запросом;
+- массовые изменения (mark_all_changed), вытесненные ключи изменений
+  или отставание больше MAX_CHANGES – полное перестроение.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .models import Product
+from .search import search_terms
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "suggestions:version"
+CHANGES_KEY = "suggestions:changes:{}"
+CHANGES_TIMEOUT = 60 * 60
+MAX_CHANGES = 100
+MAX_PREFIX = 12
+LIMIT = 10
+EVERYTHING = "*"
+
+# (версия, индекс) этого процесса; обновляется под _lock
+_memo = (None, None)
+_lock = threading.Lock()
+
+
+class SuggestionIndex:
+    """Префиксный индекс названий товаров с ранжированием по популярности."""
+
+    def __init__(self, rows=()):
+        self._products = {}
+        self._rank = {}
+        self._prefixes = {}
+        # В порядке ранга списки префиксов строятся простым append
+        for row in sorted(rows, key=lambda row: (-row[4], row[0])):
+            self._add(*row, ordered=True)
+
+    def __len__(self):
+        return len(self._products)
+
+    @staticmethod
+    def _prefixes_of(key_words):
+        return {
+            word[:length]
+            for word in key_words
+            for length in range(1, min(len(word), MAX_PREFIX) + 1)
+        }
+
+    def _add(self, pk, name, key, price, popularity, ordered=False):
+        key_words = tuple(key.split())
+        self._products[pk] = (name, price, key_words)
+        self._rank[pk] = (-popularity, pk)
+        for prefix in self._prefixes_of(key_words):
+            ids = self._prefixes.setdefault(prefix, [])
+            if ordered:
+                ids.append(pk)
+            else:
+                insort(ids, pk, key=self._rank.__getitem__)
+
+    def _remove(self, pk):
+        product = self._products.pop(pk, None)
+        if product is None:
+            return
+        rank = self._rank[pk]
+        for prefix in self._prefixes_of(product[2]):
+            ids = self._prefixes[prefix]
+            ids.pop(bisect_left(ids, rank, key=self._rank.__getitem__))
+            if not ids:
+                del self._prefixes[prefix]
+        del self._rank[pk]
+
+    def update(self, product_ids, rows):
+        """Заменяет товары product_ids строками rows; отсутствующих в rows – удаляет."""
+        for pk in product_ids:
+            self._remove(pk)
+        for row in rows:
+            self._add(*row)
+
+    def search(self, query, limit=LIMIT):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        candidates = min((self._prefixes.get(term[:MAX_PREFIX], ()) for term in terms), key=len)
+        results = []
+        for pk in candidates:
+            name, price, key_words = self._products[pk]
+            if all(any(word.startswith(term) for word in key_words) for term in terms):
+                results.append({"id": pk, "name": name, "price": price})
+                if len(results) == limit:
+                    break
+        return results
+
+
+def _rows(products):
+    return [
+        (pk, name, key, float(price), popularity)
+        for pk, name, key, price, popularity in products.values_list(
+            "pk", "name", "search_key", "effective_price", "popularity"
+        )
+    ]
+
+
+def build_index():
+    return SuggestionIndex(_rows(Product.objects.all()))
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Не счётчик с 1: после вытеснения версия не совпадёт с прежними
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _changed_ids(since, version):
+    """Id товаров, изменённых после версии since, или None – нужна полная перестройка."""
+    if since is None or not 0 < version - since <= MAX_CHANGES:
+        return None
+    keys = [CHANGES_KEY.format(v) for v in range(since + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys) or EVERYTHING in changes.values():
+        return None
+    return {pk for ids in changes.values() for pk in ids}
+
+
+def get_index():
+    """Актуальный индекс процесса; догоняет версию в кэше при необходимости."""
+    global _memo
+    version = _current_version()
+    memo_version, index = _memo
+    if memo_version == version and index is not None:
+        return index
+    with _lock:
+        memo_version, index = _memo
+        if memo_version == version and index is not None:
+            return index
+        changed = _changed_ids(memo_version, version) if index is not None else None
+        if changed is None:
+            index = build_index()
+        elif changed:
+            index.update(changed, _rows(Product.objects.filter(pk__in=changed)))
+        _memo = (version, index)
+    return index
+
+
+def suggest(query, limit=LIMIT):
+    """[{id, name, price}] – товары, у которых каждое слово запроса начинает слово ключа."""
+    index = get_index()
+    with _lock:
+        return index.search(query, limit)
+
+
+def warm_up():
+    """Строит индекс при старте воркера; без БД – первый запрос построит его сам."""
+    try:
+        get_index()
+    except DatabaseError:
+        logger.warning("Suggestion index was not built at startup", exc_info=True)
+
+
+def _publish(changes):
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.incr(VERSION_KEY)
+    # incr в файловом кэше (и DatabaseCache) не атомарен: два процесса могут
+    # получить одну версию. Проигравший не перезаписывает чужие изменения,
+    # а требует полного перестроения
+    if not cache.add(CHANGES_KEY.format(version), changes, CHANGES_TIMEOUT):
+        cache.set(CHANGES_KEY.format(version), EVERYTHING, CHANGES_TIMEOUT)
+
+
+def mark_changed(product_ids):
+    """Товары изменились (название, цена, популярность) – после фиксации транзакции."""
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: _publish(product_ids))
+
+
+def mark_all_changed():
+    """Массовое изменение – все процессы перестроят индекс целиком."""
+    transaction.on_commit(lambda: _publish(EVERYTHING))
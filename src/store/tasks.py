@@ -0,0 +1,117 @@
+"""
+Фоновые задачи в БД.
+
+enqueue(func, **kwargs) записывает задачу в таблицу Task в текущей
+транзакции: откатится изменение – не будет и задачи, зафиксируется –
+её гарантированно выполнит воркер (manage.py run_worker). Аргументы
+должны сериализоваться в JSON.
+
+Воркер забирает готовые задачи через SELECT ... FOR UPDATE SKIP LOCKED;
+на SQLite, где блокировок строк нет, – условным UPDATE queued -> running,
+который выигрывает только один воркер. Упавшая задача повторяется через
+TASK_RETRY_DELAY * 2 ** (попытка - 1) секунд (не больше TASK_RETRY_MAX_DELAY)
+до max_attempts раз. Задачи, зависшие в running дольше TASK_LOCK_TIMEOUT
+(воркер умер), возвращаются в очередь.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(func, *, run_at=None, max_attempts=None, **kwargs):
+    """Ставит func(**kwargs) в очередь. func – функция уровня модуля."""
+    return Task.objects.create(
+        name=f"{func.__module__}.{func.__qualname__}",
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or getattr(settings, "TASK_MAX_ATTEMPTS", 5),
+    )
+
+
+def retry_delay(attempt):
+    delay = getattr(settings, "TASK_RETRY_DELAY", 30) * 2 ** (attempt - 1)
+    return timedelta(seconds=min(delay, getattr(settings, "TASK_RETRY_MAX_DELAY", 60 * 60)))
+
+
+def claim(worker, limit=1):
+    """Забирает до limit готовых задач для worker. Попытка засчитывается сразу."""
+    now = timezone.now()
+    ready = Task.objects.filter(status="queued", run_at__lte=now).order_by("run_at")
+    running = {
+        "status": "running",
+        "locked_at": now,
+        "locked_by": worker,
+        "attempts": models.F("attempts") + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list("pk", flat=True)[:limit])
+            Task.objects.filter(pk__in=ids).update(**running)
+    else:
+        # Без SKIP LOCKED: задача достаётся тому, чей UPDATE её изменил
+        ids = [
+            pk
+            for pk in ready.values_list("pk", flat=True)[:limit]
+            if Task.objects.filter(pk=pk, status="queued").update(**running)
+        ]
+    return list(Task.objects.filter(pk__in=ids).order_by("run_at"))
+
+
+def run_task(task):
+    """Выполняет взятую задачу и записывает результат: done, повтор или failed."""
+    mine = Task.objects.filter(pk=task.pk, status="running", locked_by=task.locked_by)
+    try:
+        import_string(task.name)(**task.kwargs)
+    except Exception:
+        logger.exception("Task #%s %s failed (attempt %s)", task.pk, task.name, task.attempts)
+        error = traceback.format_exc()
+        now = timezone.now()
+        if task.attempts >= task.max_attempts:
+            mine.update(status="failed", last_error=error, finished_at=now, locked_at=None)
+        else:
+            mine.update(
+                status="queued",
+                run_at=now + retry_delay(task.attempts),
+                last_error=error,
+                locked_at=None,
+                locked_by="",
+            )
+        return False
+    mine.update(status="done", finished_at=timezone.now(), locked_at=None)
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших воркеров (или помечает failed)."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "TASK_LOCK_TIMEOUT", 10 * 60))
+    stale = Task.objects.filter(status="running", locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=models.F("max_attempts")).update(
+        status="failed",
+        last_error="Воркер не завершил задачу",
+        finished_at=timezone.now(),
+        locked_at=None,
+    )
+    return failed + stale.update(status="queued", locked_at=None, locked_by="")
+
+
+def run_pending(worker, limit=100):
+    """Выполняет готовые задачи до limit штук. Возвращает, сколько выполнено."""
+    done = 0
+    while done < limit:
+        tasks = claim(worker)
+        if not tasks:
+            break
+        for task in tasks:
+            run_task(task)
+            done += 1
+    return done
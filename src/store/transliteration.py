@@ -0,0 +1,127 @@
+"""
+Нормализованный ключ поиска товара (Product.search_key).
+
+Покупатели набирают «самсунг», «айфон» или «galaxy», названия товаров
+в основном латиницей, а подкатегорий – вперемешку. Ключ хранит каждое
+слово названия и категории в нескольких написаниях:
+- в нижнем регистре, кириллица – в упрощённой форме fold() (без ь/ъ,
+  ё/э/є -> е, ы/і/ї/й -> и, ґ -> г): «ультра» и «ултра» совпадают;
+- кириллические слова – латиницей (русская и украинская транслитерация);
+- латинские – кириллицей и разговорными написаниями брендов (ALIASES);
+- слова из цифр и букв («8GB/128GB», «S24») – ещё и по частям: 8, gb, 128.
+Запрос разбирается той же функцией fold(), поэтому поиск в любую сторону –
+это обычный поиск слов по индексу (store.search, store.suggestions).
+Описание в ключ не входит и хранится как написано, поэтому полнотекстовый
+поиск ищет каждое слово запроса в обеих формах (query_words).
+"""
+import re
+
+
+# Буквы и цифры: знаки препинания и операторы FTS в слова не попадают
+_WORD_RE = re.compile(r"[^\W_]+")
+_PARTS_RE = re.compile(r"\d+|[^\W\d_]+")
+_CYRILLIC_RE = re.compile(r"[а-яёіїєґ]")
+_LATIN_RE = re.compile(r"[a-z]")
+
+_FOLD = str.maketrans({
+    "ь": None, "ъ": None,
+    "ё": "е", "э": "е", "є": "е",
+    "ы": "и", "і": "и", "ї": "и", "й": "и",
+    "ґ": "г",
+})
+
+_RU_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "і": "i", "ї": "yi", "є": "ye", "ґ": "g",
+}
+# Украинская транслитерация отличается г, и, х
+_UK_TO_LATIN = {**_RU_TO_LATIN, "г": "h", "и": "y", "х": "kh"}
+
+# Сначала буквосочетания, потом одиночные буквы
+_LATIN_TO_CYRILLIC = (
+    ("shch", "щ"), ("sch", "щ"),
+    ("sh", "ш"), ("ch", "ч"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"),
+    ("ph", "ф"), ("th", "т"), ("ck", "к"), ("ee", "и"), ("oo", "у"),
+    ("ya", "я"), ("yu", "ю"), ("yo", "е"),
+    ("ce", "се"), ("ci", "си"), ("cy", "си"),
+    ("a", "а"), ("b", "б"), ("c", "к"), ("d", "д"), ("e", "е"), ("f", "ф"),
+    ("g", "г"), ("h", "х"), ("i", "и"), ("j", "дж"), ("k", "к"), ("l", "л"),
+    ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"), ("q", "к"), ("r", "р"),
+    ("s", "с"), ("t", "т"), ("u", "у"), ("v", "в"), ("w", "в"), ("x", "кс"),
+    ("y", "и"), ("z", "з"),
+)
+_LATIN_TO_CYRILLIC_RE = re.compile("|".join(latin for latin, _ in _LATIN_TO_CYRILLIC))
+_LATIN_TO_CYRILLIC_MAP = dict(_LATIN_TO_CYRILLIC)
+
+# Написания, которые побуквенная транслитерация не даёт
+ALIASES = {
+    "iphone": ("айфон",),
+    "ipad": ("айпад",),
+    "imac": ("аймак",),
+    "macbook": ("макбук",),
+    "airpods": ("аирподс", "эирподс"),
+    "apple": ("эпл", "эппл"),
+    "xiaomi": ("сяоми", "ксиоми"),
+    "huawei": ("хуавеи",),
+    "realme": ("рилми",),
+    "buds": ("бадс",),
+    "watch": ("вотч",),
+}
+
+
+def fold(text):
+    """Нижний регистр и упрощённая кириллица – одинаково для ключа и запроса."""
+    return (text or "").lower().translate(_FOLD)
+
+
+def words(text):
+    """Слова текста в форме, в которой их хранит ключ поиска."""
+    return _WORD_RE.findall(fold(text))
+
+
+def query_words(text):
+    """
+    Слова запроса парами (как набрано, после fold()): ключ поиска хранится
+    в форме fold(), а название и описание – как написаны.
+    """
+    return [
+        tuple(dict.fromkeys((word, word.translate(_FOLD))))
+        for word in _WORD_RE.findall((text or "").lower())
+    ]
+
+
+def _to_latin(word, table):
+    return "".join(table.get(char, char) for char in word)
+
+
+def _to_cyrillic(word):
+    return _LATIN_TO_CYRILLIC_RE.sub(lambda match: _LATIN_TO_CYRILLIC_MAP[match.group()], word)
+
+
+def _spellings(word):
+    """Написания одного слова (исходное – в нижнем регистре, до fold)."""
+    spellings = [word]
+    if _CYRILLIC_RE.search(word):
+        spellings += [_to_latin(word, _RU_TO_LATIN), _to_latin(word, _UK_TO_LATIN)]
+    if _LATIN_RE.search(word):
+        spellings.append(_to_cyrillic(word))
+        spellings.extend(ALIASES.get(word, ()))
+    for spelling in list(spellings):
+        parts = _PARTS_RE.findall(spelling)
+        if len(parts) > 1:
+            spellings.extend(parts)
+    return [spelling.translate(_FOLD) for spelling in spellings]
+
+
+def search_key(*texts):
+    """Ключ поиска: уникальные написания всех слов текстов через пробел."""
+    key = {}
+    for text in texts:
+        for word in _WORD_RE.findall((text or "").lower()):
+            key.update(dict.fromkeys(_spellings(word)))
+    key.pop("", None)
+    return " ".join(key)
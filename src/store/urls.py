@@ -25,6 +25,7 @@ urlpatterns = [
     
     # API
     path('api/search/', views.search_suggestions, name='search_suggestions'),
+    path('api/products/', views.products_api, name='products_api'),
 
     # Pages
     path('page/<slug:slug>/', views.page_detail, name='page_detail'),
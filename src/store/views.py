@@ -1,87 +1,154 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db import transaction, models
-from .models import Product, Category, Cart, CartItem, Order, OrderItem, Favorite, Page
+from django.http import Http404, JsonResponse
+from django.db import models
+from django.db.models.functions import Coalesce
+from .models import Product, Category, Cart, CartItem, Order, Favorite, Page
+from .analytics import RESULTS_HEADER, count_product_view, track_search
+from .cards import attach_card_versions
+from .checkout import EmptyCart, OutOfStock, place_order
+from . import guestcart, reservations, search, suggestions
+from .facets import active_facet_filters, apply_facet_filters, build_facets, get_facet_counts
+from .navigation import get_navigation
+from .pagecache import CATALOG_PARAMS, cache_anonymous_page, catalog_scope, product_scope
+from .pagination import SEARCH_SORT, order_by_sort, paginate_keyset, resolve_sort
+from .pricing import price_cart
 
 
-def _apply_filters_and_sorting(request, qs):
+PRODUCTS_PER_PAGE = 24
+
+
+def _apply_base_filters(request, qs):
     """
-    Общая логика фильтрации и сортировки товаров.
-    Поддерживает:
+    Поиск и ценовой диапазон:
+    - ?q=...
     - ?min_price=...
     - ?max_price=...
-    - ?sort=popular|price_asc|price_desc|new
     """
     min_price = request.GET.get("min_price")
     max_price = request.GET.get("max_price")
-    sort = request.GET.get("sort", "popular")
     query = request.GET.get("q")
 
+    # Полнотекстовый индекс вместо icontains (store.search)
     if query:
-        qs = qs.filter(models.Q(name__icontains=query) | models.Q(description__icontains=query))
+        qs = search.search_products(qs, query)
 
+    # Цена с учётом скидки – хранимая индексированная колонка
     if min_price:
-        qs = qs.filter(price__gte=min_price)
+        qs = qs.filter(effective_price__gte=min_price)
     if max_price:
-        qs = qs.filter(price__lte=max_price)
-
-    if sort == "price_asc":
-        qs = qs.order_by("price")
-    elif sort == "price_desc":
-        qs = qs.order_by("-price")
-    elif sort == "new":
-        qs = qs.order_by("-created_at")
-    else:
-        # popular – пока сортируем по дате создания (можно расширить метрикой продаж/просмотров)
-        qs = qs.order_by("-created_at")
+        qs = qs.filter(effective_price__lte=max_price)
 
     return qs
 
 
-def index(request):
-    """Главная страница с товарами, фильтрами и сортировкой."""
-    products = Product.objects.all()
+def _has_base_filters(request):
+    return any(request.GET.get(name) for name in ("q", "min_price", "max_price"))
 
-    # Фильтр по категории и подкатегории
+
+def _current_sort(request):
+    """Сортировка выдачи; при поиске по умолчанию – релевантность."""
+    return resolve_sort(request.GET.get("sort"), searching=bool(request.GET.get("q", "").strip()))
+
+
+def _apply_filters_and_sorting(request, qs):
+    """
+    Общая логика фильтрации и сортировки товаров.
+    Поддерживает:
+    - ?q=..., ?min_price=..., ?max_price=...
+    - фасеты ?price_bucket=...&in_stock=1&on_sale=1
+    - ?sort=popular|price_asc|price_desc|new|relevance (последняя – только с ?q)
+    """
+    sort = _current_sort(request)
+    qs = _apply_base_filters(request, qs)
+    qs = apply_facet_filters(qs, request.GET)
+    if sort == SEARCH_SORT:
+        qs = search.rank_products(qs, request.GET.get("q"))
+
+    # Все сортировки имеют tie-breaker по id – это нужно для keyset-пагинации
+    return order_by_sort(qs, sort)
+
+
+def _catalog_facets(request, selected_category, selected_subcategory):
+    """
+    Фасеты для сайдбара. Без поиска, ценового диапазона и выбранных фасетов –
+    предрасчитанные счётчики (один запрос), иначе – агрегат по текущей выдаче
+    без фасетных фильтров: каждая группа считается с фильтрами остальных.
+    """
+    filters = active_facet_filters(request.GET, selected_subcategory)
+    live = bool(filters) or _has_base_filters(request)
+    base = Product.objects.all()
+    brands = ()
+    if selected_category is not None:
+        base = base.in_category(selected_category)
+        brands = selected_category.subcategories.all()
+    if live:
+        base = _apply_base_filters(request, base)
+    counts = get_facet_counts(base, category=selected_category, filters=filters, live=live)
+    return build_facets(counts, request.GET, brands)
+
+
+def _filter_by_category(request, qs):
+    """
+    Фильтр по ?category=<slug корня>&subcategory=<slug подкатегории>.
+    Возвращает (queryset, выбранная категория, выбранная подкатегория).
+    """
     category_slug = request.GET.get("category")
     subcategory_slug = request.GET.get("subcategory")
     selected_category = None
     selected_subcategory = None
 
-    root_categories = Category.objects.filter(parent__isnull=True)
-
     if category_slug:
-        selected_category = get_object_or_404(
-            Category, slug=category_slug, parent__isnull=True
-        )
-        products = products.filter(
-            category__in=Category.objects.filter(
-                models.Q(id=selected_category.id) | models.Q(parent=selected_category)
-            )
-        )
+        # Slug разбираем по закэшированному дереву навигации, без запросов
+        navigation = get_navigation(request)
+        selected_category = navigation.get_root(category_slug)
+        if selected_category is None:
+            raise Http404("Категория не найдена")
+        # Поддерево категории через материализованный путь – на любой глубине
+        qs = qs.in_category(selected_category)
 
         if subcategory_slug:
-            selected_subcategory = get_object_or_404(
-                Category, slug=subcategory_slug, parent=selected_category
-            )
-            products = products.filter(category=selected_subcategory)
+            selected_subcategory = navigation.get_child(selected_category, subcategory_slug)
+            if selected_subcategory is None:
+                raise Http404("Подкатегория не найдена")
+            qs = qs.in_category(selected_subcategory)
+
+    return qs, selected_category, selected_subcategory
+
+
+def _search_response(response, results):
+    """Число найденных товаров – для аналитики поиска (store.analytics)."""
+    response[RESULTS_HEADER] = str(results)
+    return response
 
-    products = _apply_filters_and_sorting(request, products)
+
+def _page_querystring(request, cursor):
+    """GET-параметры текущей выдачи с подставленным курсором."""
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return params.urlencode()
+
+
+@track_search("catalog")
+@cache_anonymous_page(CATALOG_PARAMS, scope=catalog_scope)
+def index(request):
+    """Главная страница с товарами, фильтрами и сортировкой."""
+    products = Product.objects.for_listing()
+
+    # Фильтр по категории и подкатегории
+    root_categories = get_navigation(request).roots
+    products, selected_category, selected_subcategory = _filter_by_category(request, products)
 
     # Применяем сортировку/фильтры
     products = _apply_filters_and_sorting(request, products)
 
     # Показываем только первые 12 товаров на главной
-    products = products[:12]
+    products = attach_card_versions(products[:12])
 
-    # Получаем количество товаров в корзине и избранное для авторизованного пользователя
-    cart_items_count = 0
+    # Избранное для авторизованного пользователя (бейдж корзины – cart_processor)
     favorite_ids = set()
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items_count = cart.get_total_items()
         favorite_ids = set(
             Favorite.objects.filter(user=request.user, product__in=products).values_list(
                 "product_id", flat=True
@@ -93,145 +160,182 @@ def index(request):
         "root_categories": root_categories,
         "selected_category": selected_category,
         "selected_subcategory": selected_subcategory,
-        "cart_items_count": cart_items_count,
         "favorite_ids": favorite_ids,
-        "current_sort": request.GET.get("sort", "popular"),
+        "current_sort": _current_sort(request),
         "min_price": request.GET.get("min_price", ""),
         "min_price": request.GET.get("min_price", ""),
         "max_price": request.GET.get("max_price", ""),
         "query": request.GET.get("q", ""),
     }
-    return render(request, "store/index.html", context)
+    return _search_response(render(request, "store/index.html", context), len(products))
 
 
+@track_search("catalog")
+@cache_anonymous_page(CATALOG_PARAMS, scope=catalog_scope)
 def product_list(request):
     """Список всех товаров с фильтрами, категориями и подкатегориями."""
-    products = Product.objects.all()
-    root_categories = Category.objects.filter(parent__isnull=True).prefetch_related('subcategories')
-
-    category_slug = request.GET.get("category")
-    subcategory_slug = request.GET.get("subcategory")
-    selected_category = None
-    selected_subcategory = None
-
-    if category_slug:
-        selected_category = get_object_or_404(
-            Category, slug=category_slug, parent__isnull=True
-        )
-        products = products.filter(
-            category__in=Category.objects.filter(
-                models.Q(id=selected_category.id) | models.Q(parent=selected_category)
-            )
-        )
-
-        if subcategory_slug:
-            selected_subcategory = get_object_or_404(
-                Category, slug=subcategory_slug, parent=selected_category
-            )
-            products = products.filter(category=selected_subcategory)
+    products = Product.objects.for_listing()
+    root_categories = get_navigation(request).roots
 
+    products, selected_category, selected_subcategory = _filter_by_category(request, products)
     products = _apply_filters_and_sorting(request, products)
 
-    # Получаем количество товаров в корзине и избранное
-    cart_items_count = 0
+    # Keyset-пагинация: страница выбирается по курсору, а не по OFFSET
+    page = paginate_keyset(
+        products,
+        _current_sort(request),
+        cursor=request.GET.get("cursor"),
+        per_page=PRODUCTS_PER_PAGE,
+    )
+
+    # Избранное (бейдж корзины – cart_processor)
     favorite_ids = set()
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items_count = cart.get_total_items()
         favorite_ids = set(
-            Favorite.objects.filter(user=request.user, product__in=products).values_list(
-                "product_id", flat=True
-            )
+            Favorite.objects.filter(
+                user=request.user, product_id__in=[p.id for p in page]
+            ).values_list("product_id", flat=True)
         )
 
     context = {
-        "products": products,
+        "products": attach_card_versions(page.object_list),
+        "page": page,
+        "next_page_query": _page_querystring(request, page.next_cursor) if page.has_next else "",
+        "prev_page_query": _page_querystring(request, page.prev_cursor) if page.has_previous else "",
         "root_categories": root_categories,
         "selected_category": selected_category,
         "selected_subcategory": selected_subcategory,
-        "cart_items_count": cart_items_count,
+        "facets": _catalog_facets(request, selected_category, selected_subcategory),
         "favorite_ids": favorite_ids,
-        "current_sort": request.GET.get("sort", "popular"),
+        "current_sort": _current_sort(request),
         "min_price": request.GET.get("min_price", ""),
         "max_price": request.GET.get("max_price", ""),
         "query": request.GET.get("q", ""),
-        "min_price": request.GET.get("min_price", ""),
-        "max_price": request.GET.get("max_price", ""),
     }
-    return render(request, "store/product_list.html", context)
+    return _search_response(render(request, "store/product_list.html", context), len(page))
+
 
+@track_search("catalog")
+def products_api(request):
+    """
+    API каталога с keyset-пагинацией.
+    Принимает те же параметры, что и product_list, плюс ?cursor=...
+    """
+    products, _, _ = _filter_by_category(request, Product.objects.for_listing())
+    products = _apply_filters_and_sorting(request, products)
+    page = paginate_keyset(
+        products,
+        _current_sort(request),
+        cursor=request.GET.get("cursor"),
+        per_page=PRODUCTS_PER_PAGE,
+    )
+
+    results = [
+        {
+            'id': p.id,
+            'name': p.name,
+            'price': float(p.price),
+            'effective_price': float(p.effective_price),
+            'discount_percent': p.discount_percent,
+            'stock': p.stock,
+            'image': p.image.url if p.image else None,
+        }
+        for p in page
+    ]
+
+    return _search_response(JsonResponse({
+        'results': results,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }), len(results))
+
+@count_product_view
+@cache_anonymous_page(scope=product_scope)
 def product_detail(request, product_id):
     """Детальная страница товара"""
-    product = get_object_or_404(Product, id=product_id)
-    related_products = Product.objects.filter(category=product.category).exclude(id=product_id)[:4]
+    product = get_object_or_404(Product.objects.select_related("category"), id=product_id)
+    related_products = (
+        Product.objects.for_listing()
+        .filter(category=product.category)
+        .exclude(id=product_id)[:4]
+    )
     
-    # Получаем количество товаров в корзине и статус избранного
-    cart_items_count = 0
+    # Статус избранного (бейдж корзины – cart_processor)
     is_favorite = False
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items_count = cart.get_total_items()
         is_favorite = Favorite.objects.filter(user=request.user, product=product).exists()
     
     return render(request, 'store/product_detail.html', {
         'product': product,
         'related_products': related_products,
-        'cart_items_count': cart_items_count,
         'is_favorite': is_favorite,
     })
 
+@cache_anonymous_page()
 def category_list(request):
     """Список корневых категорий и их подкатегорий."""
-    root_categories = Category.objects.filter(parent__isnull=True).prefetch_related(
-        "subcategories", "products"
+    # Количество товаров во всём поддереве – подзапросом по root_category,
+    # без загрузки самих товаров
+    product_counts = (
+        Product.objects.filter(root_category=models.OuterRef("pk"))
+        .order_by()
+        .values("root_category")
+        .annotate(n=models.Count("id"))
+        .values("n")
+    )
+    root_categories = (
+        Category.objects.filter(parent__isnull=True)
+        .prefetch_related("subcategories")
+        .annotate(product_count=Coalesce(models.Subquery(product_counts), 0))
     )
-
-    # Получаем количество товаров в корзине
-    cart_items_count = 0
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items_count = cart.get_total_items()
 
     return render(
         request,
         "store/category_list.html",
         {
             "categories": root_categories,
-            "cart_items_count": cart_items_count,
         },
     )
 
 
-@login_required
+def _not_enough_stock(request, product):
+    available = reservations.available_to_sell(product.id, reservations.holder_for(request))
+    messages.error(request, f'К сожалению, в наличии только {available} шт.')
+
+
 def add_to_cart(request, product_id):
-    """Добавление товара в корзину"""
+    """Добавление товара в корзину (у гостя – в сессию) с резервом на TTL"""
     if request.method == 'POST':
         product = get_object_or_404(Product, id=product_id)
         quantity = int(request.POST.get('quantity', 1))
-        
-        # Проверяем наличие товара
-        if quantity > product.stock:
-            messages.error(request, f'К сожалению, в наличии только {product.stock} шт.')
-            return redirect('product_detail', product_id=product_id)
+        holder = reservations.holder_for(request)
+
+        if not request.user.is_authenticated:
+            # Гостевая корзина живёт в сессии до входа/регистрации
+            new_quantity = guestcart.get_quantity(request, product.id) + quantity
+            if not reservations.reserve(holder, product.id, new_quantity):
+                _not_enough_stock(request, product)
+                return redirect('product_detail', product_id=product_id)
+            guestcart.set_quantity(request, product.id, new_quantity)
+            messages.success(request, f'{product.name} добавлен в корзину!')
+            return redirect('cart_detail')
         
         # Получаем или создаем корзину пользователя
         cart, created = Cart.objects.get_or_create(user=request.user)
-        
-        # Добавляем или обновляем товар в корзине
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
+        cart_item = CartItem.objects.filter(cart=cart, product=product).first()
+        new_quantity = (cart_item.quantity if cart_item else 0) + quantity
+
+        # Резервируем всё количество в корзине; товар, разобранный другими, не добавится
+        if not reservations.reserve(holder, product.id, new_quantity):
+            _not_enough_stock(request, product)
+            return redirect('product_detail', product_id=product_id)
+
+        if cart_item:
             # Если товар уже в корзине, увеличиваем количество
-            new_quantity = cart_item.quantity + quantity
-            if new_quantity > product.stock:
-                messages.error(request, f'К сожалению, в наличии только {product.stock} шт.')
-                return redirect('product_detail', product_id=product_id)
             cart_item.quantity = new_quantity
             cart_item.save()
+        else:
+            CartItem.objects.create(cart=cart, product=product, quantity=new_quantity)
         
         messages.success(request, f'{product.name} добавлен в корзину!')
         return redirect('cart_detail')
@@ -239,31 +343,44 @@ def add_to_cart(request, product_id):
     return redirect('product_detail', product_id=product_id)
 
 
-@login_required
 def cart_detail(request):
     """Просмотр корзины"""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = cart.items.select_related('product').all()
-    
+    if request.user.is_authenticated:
+        # Корзину не создаём на GET: у нового пользователя её просто ещё нет
+        cart = Cart.objects.filter(user=request.user).first() or Cart(user=request.user)
+        pricing = price_cart(cart)
+    else:
+        pricing = guestcart.load(request)
+
     return render(request, 'store/cart.html', {
-        'cart': cart,
-        'cart_items': cart_items,
-        'cart_items_count': cart.get_total_items(),
+        'pricing': pricing,
+        'cart_items': pricing.items,
     })
 
 
-@login_required
 def update_cart_item(request, item_id):
-    """Обновление количества товара в корзине"""
+    """Обновление количества товара в корзине (у гостя item_id – id товара)"""
     if request.method == 'POST':
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
         quantity = int(request.POST.get('quantity', 1))
+        holder = reservations.holder_for(request)
+
+        if not request.user.is_authenticated:
+            product = get_object_or_404(Product, id=item_id)
+            if not reservations.reserve(holder, product.id, quantity):
+                _not_enough_stock(request, product)
+            else:
+                guestcart.set_quantity(request, product.id, quantity)
+                messages.success(request, 'Количество обновлено' if quantity > 0 else 'Товар удален из корзины')
+            return redirect('cart_detail')
+
+        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
         
         if quantity <= 0:
             cart_item.delete()
+            reservations.release(holder, [cart_item.product_id])
             messages.success(request, 'Товар удален из корзины')
-        elif quantity > cart_item.product.stock:
-            messages.error(request, f'К сожалению, в наличии только {cart_item.product.stock} шт.')
+        elif not reservations.reserve(holder, cart_item.product_id, quantity):
+            _not_enough_stock(request, cart_item.product)
         else:
             cart_item.quantity = quantity
             cart_item.save()
@@ -272,55 +389,43 @@ def update_cart_item(request, item_id):
     return redirect('cart_detail')
 
 
-@login_required
 def remove_from_cart(request, item_id):
-    """Удаление товара из корзины"""
+    """Удаление товара из корзины (у гостя item_id – id товара)"""
+    holder = reservations.holder_for(request)
+    if not request.user.is_authenticated:
+        product = get_object_or_404(Product, id=item_id)
+        guestcart.set_quantity(request, product.id, 0)
+        reservations.release(holder, [product.id])
+        messages.success(request, f'{product.name} удален из корзины')
+        return redirect('cart_detail')
+
     cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
     product_name = cart_item.product.name
     cart_item.delete()
+    reservations.release(holder, [cart_item.product_id])
     messages.success(request, f'{product_name} удален из корзины')
     return redirect('cart_detail')
 
 
 @login_required
-@transaction.atomic
 def checkout(request):
     """Оформление заказа"""
-    cart = get_object_or_404(Cart, user=request.user)
-    cart_items = cart.items.select_related('product').all()
-    
-    if not cart_items:
+    if request.method != 'POST':
+        return redirect('cart_detail')
+
+    try:
+        order = place_order(request.user)
+    except EmptyCart:
         messages.error(request, 'Ваша корзина пуста')
         return redirect('cart_detail')
-    
-    # Проверяем наличие товаров
-    for item in cart_items:
-        if item.quantity > item.product.stock:
-            messages.error(request, f'Недостаточно товара {item.product.name} на складе')
-            return redirect('cart_detail')
-    
-    # Создаем заказ
-    total_price = cart.get_total_price()
-    order = Order.objects.create(
-        user=request.user,
-        total_price=total_price
-    )
-    
-    # Создаем элементы заказа и уменьшаем количество товара на складе
-    for item in cart_items:
-        OrderItem.objects.create(
-            order=order,
-            product=item.product,
-            quantity=item.quantity,
-            price=item.product.price
+    except OutOfStock as e:
+        missing = ', '.join(
+            f'{product.name}: заказано {requested}, в наличии {available}'
+            for product, requested, available in e.shortages
         )
-        # Уменьшаем количество товара на складе
-        item.product.stock -= item.quantity
-        item.product.save()
-    
-    # Очищаем корзину
-    cart_items.delete()
-    
+        messages.error(request, f'Недостаточно товара на складе – {missing}')
+        return redirect('cart_detail')
+
     messages.success(request, f'Заказ #{order.id} успешно оформлен! Дождитесь, с вами свяжется оператор.')
     return redirect('order_detail', order_id=order.id)
 
@@ -328,48 +433,40 @@ def checkout(request):
 @login_required
 def order_detail(request, order_id):
     """Детали заказа"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
-    
-    # Получаем количество товаров в корзине
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items_count = cart.get_total_items()
-    
+    # Позиции хранят копию данных товара – каталог не нужен
+    order = get_object_or_404(
+        Order.objects.select_related('user').prefetch_related('items'),
+        id=order_id,
+        user=request.user,
+    )
+
     return render(request, 'store/order_detail.html', {
         'order': order,
-        'cart_items_count': cart_items_count,
     })
 
 
 @login_required
 def order_list(request):
     """Список заказов пользователя"""
-    orders = Order.objects.filter(user=request.user).prefetch_related('items__product')
-    
-    # Получаем количество товаров в корзине
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items_count = cart.get_total_items()
-    
+    orders = Order.objects.filter(user=request.user).prefetch_related('items')
+
     return render(request, 'store/order_list.html', {
         'orders': orders,
-        'cart_items_count': cart_items_count,
     })
 
 
 @login_required
 def favorites_list(request):
     """Список избранных товаров пользователя."""
-    favorites = Favorite.objects.filter(user=request.user).select_related("product", "product__category")
-    products = [fav.product for fav in favorites]
-
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items_count = cart.get_total_items()
+    products = attach_card_versions(
+        Product.objects.for_listing().filter(favorite_for__user=request.user)
+    )
 
     return render(
         request,
         "store/favorites_list.html",
         {
             "products": products,
-            "cart_items_count": cart_items_count,
         },
     )
 
@@ -393,39 +490,21 @@ def toggle_favorite(request, product_id):
     return redirect(next_url)
 
 
+@track_search("suggest")
 def search_suggestions(request):
-    """API endpoint для автодоповнення пошуку."""
+    """API endpoint для автодоповнення пошуку – з індексу в пам'яті, без запитів до БД."""
     query = request.GET.get('q', '')
     
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    # Шукаємо товари за назвою
-    products = Product.objects.filter(
-        name__icontains=query
-    ).values('id', 'name', 'price')[:10]
-    
-    results = [
-        {
-            'id': p['id'],
-            'name': p['name'],
-            'price': float(p['price'])
-        }
-        for p in products
-    ]
-    
-    return JsonResponse({'results': results})
+    results = suggestions.suggest(query)
+    return _search_response(JsonResponse({'results': results}), len(results))
 
 def page_detail(request, slug):
     """Відображення статичної сторінки."""
     page = get_object_or_404(Page, slug=slug)
-    
-    cart_items_count = 0
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items_count = cart.get_total_items()
-        
+
     return render(request, 'store/page_detail.html', {
         'page': page,
-        'cart_items_count': cart_items_count
     })